@@ -0,0 +1,5 @@
+"""HoshinoBot 的离线基准测试与校验脚本
+
+在仓库根目录下以`python -m bench.<name>`运行，需要已配置好的`hoshino/config`。
+本仓库没有单元测试，`normalize`与`startup`等校验脚本在检查失败时以非零状态退出，作为部署前的回归检查。
+"""
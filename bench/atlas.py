@@ -0,0 +1,67 @@
+"""头像图集的差分校验与基准测试
+
+图集不存在时先行构建。校验经由图集渲染的组队图与逐文件读取时逐像素一致，
+并比较`gen_team_pic`在以下情形的耗时（每轮均清空已渲染头像的缓存）：
+逐文件解码、逐文件但命中`ResImg.open`的解码缓存、从图集复制。
+
+    python -m bench.atlas [-n 200]
+"""
+
+import argparse
+import random
+import time
+
+from PIL import ImageChops
+
+import hoshino
+from hoshino import R
+from hoshino.modules.priconne import chara
+
+from .chara import random_teams
+
+
+def timeit(teams, clear_decoded):
+    t = time.perf_counter()
+    for team in teams:
+        chara._icon_cache.clear()
+        if clear_decoded:
+            R.image_cache.clear()
+        chara.gen_team_pic(team)
+    return (time.perf_counter() - t) / len(teams)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', type=int, default=200)
+    args = parser.parse_args()
+
+    atlas = chara.icon_atlas
+    if not len(atlas):
+        sizes = getattr(hoshino.config, 'ICON_ATLAS_SIZES', [64])
+        t = time.perf_counter()
+        n = atlas.build(sizes)
+        print(f'built atlas of {n} icons at sizes {sizes} in {time.perf_counter() - t:.2f}s')
+
+    teams = random_teams(args.n, random.Random(0))
+    for team in teams:
+        chara._icon_cache.clear()
+        atlas.enabled = False
+        expected = chara.gen_team_pic(team)
+        chara._icon_cache.clear()
+        atlas.enabled = True
+        if ImageChops.difference(expected, chara.gen_team_pic(team)).getbbox() is not None:
+            raise SystemExit(f'Mismatch on team {[(c.id, c.star, c.equip) for c in team]}')
+    print(f'{args.n} teams rendered identically')
+
+    atlas.enabled = False
+    t_decode = timeit(teams, clear_decoded=True)
+    t_cached = timeit(teams, clear_decoded=False)
+    atlas.enabled = True
+    t_atlas = timeit(teams, clear_decoded=True)
+    print(f'per-file, decode      {t_decode * 1000:8.3f} ms/team')
+    print(f'per-file, decoded LRU {t_cached * 1000:8.3f} ms/team')
+    print(f'atlas                 {t_atlas * 1000:8.3f} ms/team')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""`chara.gen_team_pic`的差分校验与基准测试
+
+以改动前的`render_icon`实现为基准，校验缓存后的渲染结果逐像素一致，
+并比较随机队伍（每轮清空头像缓存，仅复用预缩放的星级图标）与重复队伍（头像缓存命中）的耗时。
+三者均经由`ResImg.open`的解码缓存读取头像，差异只来自缩放与合成。
+
+    python -m bench.chara [-n 200]
+"""
+
+import argparse
+import random
+import time
+
+from PIL import Image, ImageChops
+
+from hoshino.modules.priconne import _pcr_data, chara
+
+
+def legacy_render_icon(c: chara.Chara, size, star_slot_verbose=True) -> Image:
+    pic = c.icon.open().convert('RGBA').resize((size, size), Image.LANCZOS)
+    l = size // 6
+    star_lap = round(l * 0.15)
+    margin_x = (size - 6*l) // 2
+    margin_y = round(size * 0.05)
+    if c.star:
+        for i in range(5 if star_slot_verbose else min(c.star, 5)):
+            a = i*(l-star_lap) + margin_x
+            b = size - l - margin_y
+            s = chara.gadget('star') if c.star > i else chara.gadget('star_disabled')
+            s = s.resize((l, l), Image.LANCZOS)
+            pic.paste(s, (a, b, a+l, b+l), s)
+        if 6 == c.star:
+            a = 5*(l-star_lap) + margin_x
+            b = size - l - margin_y
+            s = chara.gadget('star_pink')
+            s = s.resize((l, l), Image.LANCZOS)
+            pic.paste(s, (a, b, a+l, b+l), s)
+    if c.equip:
+        l = round(l * 1.5)
+        a = margin_x
+        b = margin_x
+        s = chara.gadget('equip').resize((l, l), Image.LANCZOS)
+        pic.paste(s, (a, b, a+l, b+l), s)
+    return pic
+
+
+def legacy_gen_team_pic(team, size=64, star_slot_verbose=True):
+    num = len(team)
+    des = Image.new('RGBA', (num*size, size), (255, 255, 255, 255))
+    for i, c in enumerate(team):
+        src = legacy_render_icon(c, size, star_slot_verbose)
+        des.paste(src, (i * size, 0), src)
+    return des
+
+
+def random_teams(n, rng):
+    ids = [i for i in _pcr_data.CHARA_NAME if 1000 < i < 1900]
+    return [[chara.fromid(i, star=rng.randint(1, 6), equip=rng.randint(0, 1)) for i in rng.sample(ids, 5)]
+            for _ in range(n)]
+
+
+def timeit(func, teams):
+    t = time.perf_counter()
+    for team in teams:
+        func(team)
+    return (time.perf_counter() - t) / len(teams)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    teams = random_teams(args.n, rng)
+    for team in teams:
+        for verbose in (True, False):
+            diff = ImageChops.difference(legacy_gen_team_pic(team, star_slot_verbose=verbose),
+                                         chara.gen_team_pic(team, star_slot_verbose=verbose))
+            if diff.getbbox() is not None:
+                raise SystemExit(f'Mismatch on team {[(c.id, c.star, c.equip) for c in team]}')
+    print(f'{args.n} teams rendered identically')
+
+    t_legacy = timeit(legacy_gen_team_pic, teams)
+    t_cold = timeit(lambda team: (chara._icon_cache.clear(), chara.gen_team_pic(team)), teams)
+    repeated = [teams[i % 10] for i in range(args.n)]     # 十个常见队伍反复出现，类似竞技场查询
+    chara.gen_team_pic(teams[0])
+    t_warm = timeit(chara.gen_team_pic, repeated)
+    print(f'legacy              {t_legacy * 1000:8.3f} ms/team')
+    print(f'sprites, cold icons {t_cold * 1000:8.3f} ms/team')
+    print(f'sprites, warm icons {t_warm * 1000:8.3f} ms/team')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""图片编码的基准测试
+
+以现有的渲染函数生成测试图片（十连结果、竞技场查询结果、会战伤害统计图），
+比较不同编码参数的耗时与base64后的消息体积，以及命中编码缓存时的耗时（即计算内容哈希）。
+
+    python -m bench.encode [-n 10]
+"""
+
+import argparse
+import base64
+import random
+import time
+
+from matplotlib.figure import Figure
+
+from hoshino.modules.priconne import _pcr_data, chara
+from hoshino.modules.priconne.arena import render_atk_def_teams
+from hoshino.modules.priconne.gacha import render_gacha_pic
+from hoshino.util import imgcodec
+
+CANDIDATES = (
+    ('PNG (原实现)', imgcodec.EncodeOptions('PNG', compress_level=6)),
+    ('PNG level=1', imgcodec.EncodeOptions('PNG', compress_level=1)),
+    ('PNG 256色', imgcodec.EncodeOptions('PNG', compress_level=6, quantize=True)),
+    ('PNG 256色 level=1', imgcodec.EncodeOptions('PNG', compress_level=1, quantize=True)),
+    ('JPEG q=85', imgcodec.EncodeOptions('JPEG', quality=85)),
+    ('WEBP q=85', imgcodec.EncodeOptions('WEBP', quality=85)),
+)
+
+
+def _random_team(rng, n=5):
+    ids = rng.sample([i for i in _pcr_data.CHARA_NAME if 1000 < i < 1900], n)
+    return [chara.fromid(i, star=rng.randint(1, 6)) for i in ids]
+
+
+def gacha_pic(rng):
+    return render_gacha_pic([_random_team(rng), _random_team(rng)])
+
+
+def arena_pic(rng):
+    entries = [{
+        'atk': _random_team(rng),
+        'qkey': f'{rng.randint(0, 99999):05d}',
+        'up': rng.randint(0, 999), 'my_up': 0,
+        'down': rng.randint(0, 99), 'my_down': 0,
+        'user_like': rng.choice((-1, 0, 1)),
+    } for _ in range(10)]
+    return render_atk_def_teams(entries)
+
+
+def clan_chart(rng):
+    yn = 30
+    y_size = 0.3 * yn + 1.0
+    fig = Figure()
+    fig.set_size_inches(10, y_size)
+    ax = fig.add_subplot()
+    colors = ['#00a2e8', '#22b14c', '#b5e61d', '#fff200', '#ff7f27']
+    left = [0] * yn
+    for b in range(5):
+        dmg = [rng.randint(0, 3000000) for _ in range(yn)]
+        ax.barh(range(yn), dmg, left=left, align='center', color=colors[b])
+        left = [l + d for l, d in zip(left, dmg)]
+    ax.set_yticks(range(yn))
+    ax.set_yticklabels([f'member{i}' for i in range(yn)])
+    ax.invert_yaxis()
+    fig.subplots_adjust(left=0.12, right=0.96, top=1 - 0.35 / y_size, bottom=0.55 / y_size)
+    return imgcodec.figure_to_image(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', type=int, default=10, help='repeats per image')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    for title, render in (('十连结果', gacha_pic), ('竞技场查询', arena_pic), ('会战伤害统计', clan_chart)):
+        img = render(rng)
+        print(f'{title} {img.size[0]}x{img.size[1]} {img.mode}')
+        print(f'  {"options":<20} {"encode(ms)":>10} {"base64(KiB)":>12}')
+        for name, opts in CANDIDATES:
+            best = float('inf')
+            for _ in range(args.n):
+                t = time.perf_counter()
+                data = imgcodec._encode(img, opts)
+                best = min(best, time.perf_counter() - t)
+            size = len(base64.b64encode(data)) / 1024
+            print(f'  {name:<20} {best * 1000:10.2f} {size:12.1f}')
+        imgcodec.encode(img)
+        t = time.perf_counter()
+        for _ in range(args.n):
+            imgcodec.encode(img)
+        print(f'  {"命中编码缓存":<20} {(time.perf_counter() - t) / args.n * 1000:10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""日志调用开销的基准测试
+
+对比旧版同步写入的StreamHandler + FileHandler与`hoshino.log`的队列化管线，
+测量调用方线程（即事件循环）上每条INFO日志的耗时。两者写入相同的目标：
+一个临时文件与os.devnull。
+
+    python -m bench.log [-n 100000]
+"""
+
+import argparse
+import logging
+import os
+import queue
+import tempfile
+import time
+from logging.handlers import QueueListener
+
+from hoshino.log import _QueueHandler, formatter
+
+
+def _sinks(tmpdir, name):
+    stream = logging.StreamHandler(open(os.devnull, 'w'))
+    file = logging.FileHandler(os.path.join(tmpdir, f'{name}.log'), encoding='utf8')
+    for h in (stream, file):
+        h.setFormatter(formatter)
+    return stream, file
+
+
+def _run(logger, n):
+    start = time.perf_counter()
+    for i in range(n):
+        logger.info('Message %d triggered %s.', i, 'bench_handler')
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sync_logger = logging.getLogger('bench.sync')
+        sync_logger.propagate = False
+        sync_logger.setLevel(logging.INFO)
+        for h in _sinks(tmpdir, 'sync'):
+            sync_logger.addHandler(h)
+        t_sync = _run(sync_logger, args.n)
+
+        q = queue.SimpleQueue()
+        listener = QueueListener(q, *_sinks(tmpdir, 'queued'))
+        listener.start()
+        queued_logger = logging.getLogger('bench.queued')
+        queued_logger.propagate = False
+        queued_logger.setLevel(logging.INFO)
+        queued_logger.addHandler(_QueueHandler(q))
+        t_queued = _run(queued_logger, args.n)
+        start = time.perf_counter()
+        listener.stop()
+        t_drain = time.perf_counter() - start
+
+    print(f'sync handlers    {t_sync / args.n * 1e6:8.2f} us/record on caller thread')
+    print(f'queue handler    {t_queued / args.n * 1e6:8.2f} us/record on caller thread'
+          f' (background drain took another {t_drain:.2f}s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""`util.normalize_str`的差分校验与基准测试
+
+以花名册全部角色名与敏感词表为语料，逐条对比查表实现与
+原始实现（NFKC + lower + zhconv.convert）的输出，并比较二者耗时。
+
+本仓库没有单元测试与CI，此脚本即是`normalize_str`的回归检查：
+任一输出不一致时以状态1退出。修改`normalize_str`的转换表、升级zhconv
+或更新花名册后，应在部署前运行：
+
+    python -m bench.normalize
+"""
+
+import os
+import sys
+import time
+import unicodedata
+
+import zhconv
+
+from hoshino import util
+from hoshino.modules.priconne import _pcr_data
+
+
+def reference(string) -> str:
+    string = unicodedata.normalize('NFKC', string)
+    string = string.lower()
+    return zhconv.convert(string, 'zh-hans')
+
+
+def load_corpus():
+    names = [n for names in _pcr_data.CHARA_NAME.values() for n in names]
+    filename = os.path.join(os.path.dirname(util.__file__), 'textfilter/sensitive_words.txt')
+    with open(filename, encoding='utf8') as f:
+        words = [line.strip() for line in f]
+    return names + words
+
+
+def timeit(func, corpus, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        t = time.perf_counter()
+        for s in corpus:
+            func(s)
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def main():
+    corpus = load_corpus()
+    diff = [s for s in corpus if util.normalize_str(s) != reference(s)]
+    for s in diff[:20]:
+        print(f'MISMATCH {s!r}: {util.normalize_str(s)!r} != {reference(s)!r}')
+    print(f'{len(corpus)} strings checked, {len(diff)} mismatch')
+
+    t_ref = timeit(reference, corpus)
+    t_cold = timeit(util.normalize_str.__wrapped__, corpus)
+    t_hot = timeit(util.normalize_str, corpus)
+    n = len(corpus)
+    print(f'zhconv.convert  {t_ref / n * 1e6:8.2f} us/call')
+    print(f'table (no LRU)  {t_cold / n * 1e6:8.2f} us/call')
+    print(f'table + LRU     {t_hot / n * 1e6:8.2f} us/call  {util.normalize_str.cache_info()}')
+    return 1 if diff else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,37 @@
+"""启动耗时检查
+
+在全新的解释器中计时`import hoshino`与`hoshino.init()`，列出导入耗时最多的模块。
+本仓库没有单元测试与CI，此脚本即是启动耗时的回归检查：
+总耗时超出预算（缺省为配置项`STARTUP_TIME_BUDGET`）时以状态1退出。
+新增模块或依赖后，应在部署前运行：
+
+    python -m bench.startup [--budget 秒数] [--top 30]
+"""
+
+import argparse
+import sys
+
+from hoshino.importtime import ImportTimer
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--budget', type=float, default=None, help='缺省使用配置项STARTUP_TIME_BUDGET')
+    parser.add_argument('--top', type=int, default=30)
+    args = parser.parse_args()
+
+    with ImportTimer() as timer:
+        import hoshino
+        hoshino.init()
+    print(timer.report(args.top))
+
+    budget = args.budget or getattr(hoshino.config, 'STARTUP_TIME_BUDGET', None)
+    if budget and timer.total > budget:
+        print(f'FAILED: startup took {timer.total:.2f}s, budget is {budget}s')
+        return 1
+    print(f'OK: startup took {timer.total:.2f}s' + (f', budget is {budget}s' if budget else ''))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""触发器分发的基准测试
+
+按`MODULES_ON`加载全部服务，以合成的群消息语料回放`trigger.chain`
+与`msghandler.handle_message`，报告各触发器及整体的吞吐量与p50/p99延迟。
+回放时所有ServiceFunc均被替换为空操作，不会调用bot API，可完全离线运行。
+
+    python -m bench.trigger [-n 20000] [--seed 0]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from collections import defaultdict
+
+from nonebot.message import CanceledException
+
+import hoshino
+from hoshino import Message, MessageSegment, trigger
+from hoshino.executor import executor
+from hoshino.typing import CQEvent
+
+MISS_TEXTS = (
+    '今天天气不错', '有人一起打会战吗', 'hhhhhhhhhhhhh', '草', '我去上班了',
+    '这期活动的剧情好长啊，看了一晚上还没看完', '？', '晚安', '1', '兰德索尔今天也很和平',
+)
+REX_TEXTS = ('来一份精致睡眠套餐', 'rank表', '日服rank', '来点色图', '嘉然小姐', '再来一张')
+GROUPS = tuple(range(100000, 100020))
+
+
+def _payload(message: Message, message_id: int):
+    return {
+        'post_type': 'message',
+        'message_type': 'group',
+        'sub_type': 'normal',
+        'message_id': message_id,
+        'self_id': 10000,
+        'group_id': random.choice(GROUPS),
+        'user_id': random.randint(100000, 999999),
+        'time': int(time.time()),
+        'anonymous': None,
+        'sender': {'role': 'member', 'card': '', 'nickname': 'bench'},
+        'to_me': False,
+        'message': message,
+        'raw_message': str(message),
+    }
+
+
+def build_corpus(n: int):
+    prefixes = list(trigger.prefix.trie.keys())
+    keywords = list(trigger.keyword.allkw.keys())
+    kinds = {
+        'prefix': lambda: Message(random.choice(prefixes) + ' ' + random.choice(MISS_TEXTS)) if prefixes else None,
+        'fullmatch': lambda: Message(random.choice(prefixes)) if prefixes else None,
+        'keyword': lambda: Message(random.choice(MISS_TEXTS) + random.choice(keywords)) if keywords else None,
+        'rex': lambda: Message(random.choice(REX_TEXTS)),
+        'miss': lambda: Message(random.choice(MISS_TEXTS)),
+        'image': lambda: Message(MessageSegment.image('bench.jpg')),
+    }
+    corpus = []
+    for i in range(n):
+        kind = random.choice(list(kinds))
+        msg = kinds[kind]() or kinds['miss']()
+        corpus.append((kind, _payload(msg, i)))
+    return corpus
+
+
+def _fresh(payload) -> CQEvent:
+    payload = dict(payload)
+    payload['message'] = Message(payload['message'])    # 触发器会修改消息，每次回放使用副本
+    return CQEvent(payload)
+
+
+def _percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] if samples else 0
+
+
+def _report(name, samples):
+    total = sum(samples)
+    rate = len(samples) / total if total else float('inf')
+    print(f'{name:<24}{rate:>12.0f} msg/s   p50 {_percentile(samples, 0.5) * 1e6:8.1f} us'
+          f'   p99 {_percentile(samples, 0.99) * 1e6:8.1f} us')
+
+
+def check_text(corpus):
+    """惰性查找在首个handler处停止时，`plain_text`仍应与原先先剥离前后缀、再提取文本的结果一致"""
+    for _, payload in corpus:
+        expected = _fresh(payload)
+        trigger.prefix.find_handler(expected)
+        trigger.suffix.find_handler(expected)
+        expected = expected.message.extract_plain_text().strip()
+        event = _fresh(payload)
+        next(trigger.find_handlers(event), None)
+        if event.plain_text != expected:
+            raise SystemExit(f'plain_text mismatch: {event.plain_text!r} != {expected!r}')
+
+
+def bench_chain(corpus):
+    cost = defaultdict(list)
+    for _, payload in corpus:
+        event = _fresh(payload)
+        for t in trigger.chain:
+            start = time.perf_counter()
+            t.find_handler(event)
+            cost[type(t).__name__].append(time.perf_counter() - start)
+    return cost
+
+
+async def bench_handle_message(bot, corpus):
+    from hoshino.msghandler import handle_message
+    cost = defaultdict(list)
+    for kind, payload in corpus:
+        event = _fresh(payload)
+        start = time.perf_counter()
+        try:
+            await handle_message(bot, event, None)
+        except CanceledException:
+            pass
+        cost[kind].append(time.perf_counter() - start)
+    while any(executor.stats()[k] for k in ('pending', 'running', 'running_unordered')):
+        await asyncio.sleep(0)  # 等待后台执行的handler全部结束
+    return cost
+
+
+def _stub_service_funcs():
+    async def noop(bot, event):
+        pass
+    sfs = set()
+    for sfs_ in trigger.prefix.trie.values():
+        sfs.update(sfs_)
+    for sfs_ in trigger.suffix.trie.values():
+        sfs.update(sfs_)
+    for sfs_ in trigger.keyword.allkw.values():
+        sfs.update(sfs_)
+    for sfs_ in trigger.rex.allrex.values():
+        sfs.update(sfs_)
+    for sf in sfs:
+        sf.func = noop
+    return len(sfs)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    bot = hoshino.init()
+    print(f'{len(hoshino.Service.get_loaded_services())} services, {_stub_service_funcs()} service funcs loaded')
+    corpus = build_corpus(args.n)
+    check_text(corpus)
+
+    print('\n== trigger.chain ==')
+    cost = bench_chain(corpus)
+    for name, samples in cost.items():
+        _report(name, samples)
+    _report('total', [sum(x) for x in zip(*cost.values())])
+
+    print('\n== msghandler.handle_message ==')
+    trigger.text_stats.clear()
+    cost = asyncio.get_event_loop().run_until_complete(bench_handle_message(bot, corpus))
+    for kind, samples in cost.items():
+        _report(kind, samples)
+    _report('total', [x for samples in cost.values() for x in samples])
+    stats = trigger.text_stats
+    print(f"normalized {stats['norm_text']}/{stats['event']} events, extracted plain text {stats['plain_text']} times")
+
+
+if __name__ == '__main__':
+    main()
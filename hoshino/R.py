@@ -1,5 +1,10 @@
+import ipaddress
 import os
-from urllib.parse import urljoin
+import random
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import urljoin, urlparse
 from urllib.request import pathname2url
 
 from nonebot import MessageSegment
@@ -8,6 +13,264 @@ from PIL import Image
 import hoshino
 from hoshino import util
 
+_RES_ROUTE = '/res/'
+
+
+class ResIndex:
+    """RES_DIR的内存索引
+
+    记录每个目录下的文件，存在性检查与随机选取文件无需访问文件系统。
+    `refresh`只对各目录做一次stat，仅重新扫描mtime有变化的目录，由定时任务周期调用；
+    hoshino自身写入资源后应调用`add`使其立即可见。
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._dirs: Dict[str, Tuple[float, List[str], Set[str]]] = None    # {相对目录: (mtime, 文件列表, 文件集合)}
+        self._lock = threading.RLock()  # refresh在调度器的线程池中执行
+
+    @staticmethod
+    def _key(path) -> str:
+        return os.path.normpath(path)
+
+    def _scan_dir(self, rel, ancestors=frozenset()):
+        files, subdirs = [], []
+        try:
+            st = os.stat(os.path.join(self.root, rel))
+            node = (st.st_dev, st.st_ino)
+            if node in ancestors:   # 指向上级目录的符号链接，跳过以免无限递归
+                return
+            ancestors = ancestors | {node}
+            mtime = st.st_mtime
+            for entry in os.scandir(os.path.join(self.root, rel)):
+                if entry.is_dir():
+                    subdirs.append(self._key(os.path.join(rel, entry.name)))
+                elif entry.is_file():
+                    files.append(entry.name)
+        except FileNotFoundError:
+            self._dirs.pop(rel, None)
+            return
+        self._dirs[rel] = (mtime, files, set(files))
+        for sub in subdirs:
+            if sub not in self._dirs:
+                self._scan_dir(sub, ancestors)
+
+    def rescan(self) -> int:
+        """重建整个索引，返回文件总数"""
+        with self._lock:
+            self._dirs = {}
+            self._scan_dir('.')
+            return sum(len(d[1]) for d in self._dirs.values())
+
+    def refresh(self):
+        with self._lock:
+            if self._dirs is None:
+                self.rescan()
+                return
+            for rel, (mtime, _, _) in list(self._dirs.items()):
+                try:
+                    changed = os.stat(os.path.join(self.root, rel)).st_mtime != mtime
+                except FileNotFoundError:
+                    changed = True
+                if changed:     # 已删除的目录在此被移出索引，新建的子目录随其父目录扫描加入
+                    self._scan_dir(rel)
+
+    def _get(self, rel_dir) -> Optional[Tuple[float, List[str], Set[str]]]:
+        if self._dirs is None:
+            self.rescan()
+        return self._dirs.get(self._key(rel_dir))
+
+    def exists(self, rel_path) -> bool:
+        rel_path = self._key(rel_path)
+        with self._lock:
+            if self._get(rel_path) is not None:
+                return True
+            d = self._get(os.path.dirname(rel_path) or '.')
+            return d is not None and os.path.basename(rel_path) in d[2]
+
+    def listdir(self, rel_dir) -> List[str]:
+        """目录下的文件名（不含子目录）"""
+        with self._lock:
+            d = self._get(rel_dir)
+            return list(d[1]) if d else []
+
+    def random_file(self, rel_dir) -> Optional[str]:
+        with self._lock:
+            d = self._get(rel_dir)
+            return random.choice(d[1]) if d and d[1] else None
+
+    def add(self, rel_path):
+        """登记新写入的文件"""
+        rel_path = self._key(rel_path)
+        with self._lock:
+            rel_dir = os.path.dirname(rel_path) or '.'
+            d = self._get(rel_dir)
+            if d is None:
+                self._scan_dir(rel_dir)
+            elif os.path.basename(rel_path) not in d[2]:
+                d[1].append(os.path.basename(rel_path))
+                d[2].add(os.path.basename(rel_path))
+
+
+index = ResIndex(os.path.expanduser(hoshino.config.RES_DIR))
+
+
+class ImageCache:
+    """解码后资源图片的LRU缓存，按像素数据的大小计入内存预算
+
+    条目记录解码时文件的mtime，文件被替换或改写后即视为未命中，不会继续返回旧图
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[str, Tuple[int, Image.Image]]" = OrderedDict()    # {path: (mtime_ns, img)}
+        self._lock = threading.Lock()   # 渲染在线程池中进行
+
+    @staticmethod
+    def _nbytes(img: Image.Image) -> int:
+        return img.width * img.height * len(img.getbands())
+
+    def get(self, path, mtime_ns) -> Optional[Image.Image]:
+        with self._lock:
+            entry = self._data.get(path)
+            if entry is None or entry[0] != mtime_ns:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._data.move_to_end(path)
+            return entry[1]
+
+    def put(self, path, mtime_ns, img: Image.Image):
+        nbytes = self._nbytes(img)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            self._pop(path)
+            self._data[path] = (mtime_ns, img)
+            self.size += nbytes
+            while self.size > self.max_bytes:
+                _, (_, old) = self._data.popitem(last=False)
+                self.size -= self._nbytes(old)
+                self.evictions += 1
+
+    def _pop(self, path):
+        entry = self._data.pop(path, None)
+        if entry is not None:
+            self.size -= self._nbytes(entry[1])
+
+    def invalidate(self, path):
+        with self._lock:
+            self._pop(path)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'images': len(self._data), 'size': self.size, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+image_cache = ImageCache(getattr(hoshino.config, 'RES_IMAGE_CACHE_BYTES', 128 * 1024 * 1024))
+
+
+_peers: Dict[str, Tuple[bool, str]] = {}   # {self_id: (OneBot端是否在本机, 其连接时使用的Host)}
+
+
+def track_peers(app):
+    """记录各OneBot端的来源，供`RES_PROTOCOL = 'auto'`时选择协议"""
+    from quart import websocket
+
+    async def track_peer():
+        self_id = websocket.headers.get('X-Self-ID')
+        if not self_id:
+            return
+        try:
+            local = ipaddress.ip_address(websocket.remote_addr).is_loopback
+        except (TypeError, ValueError):
+            local = False
+        _peers[self_id] = (local, websocket.headers.get('Host', ''))
+        hoshino.logger.info(f'OneBot of {self_id} connected from {"local" if local else websocket.remote_addr}, '
+                            f'resource protocol: {protocol()}')
+
+    app.before_websocket(track_peer)
+
+
+def _remote_hosts() -> Set[str]:
+    try:
+        online = set(hoshino.get_self_ids())
+    except ValueError:  # bot尚未初始化
+        return set()
+    return {host for sid, (local, host) in _peers.items() if sid in online and not local and host}
+
+
+def protocol() -> str:
+    """实际使用的资源协议
+
+    `RES_PROTOCOL`为auto时按已连接的OneBot端选择：全部在本机时用file，
+    否则用http（需配置`RES_URL`，或各远程端经同一地址连接bot，此时使用bot自身的`/res/`路由），
+    都不满足或尚无连接时用base64
+    """
+    proto = hoshino.config.RES_PROTOCOL
+    if proto != 'auto':
+        return proto
+    try:
+        online = set(hoshino.get_self_ids())
+    except ValueError:
+        return 'base64'
+    peers = [peer for sid, peer in _peers.items() if sid in online]
+    if not peers:
+        return 'base64'
+    if all(local for local, _ in peers):
+        return 'file'
+    if hoshino.config.RES_URL or len(_remote_hosts()) == 1:
+        return 'http'
+    return 'base64'
+
+
+def _builtin_res_url() -> Optional[str]:
+    """bot自身`/res/`路由的url，取自远程OneBot端连接bot时使用的地址（对其必然可达），无法确定时返回None"""
+    hosts = _remote_hosts() if hoshino.config.RES_PROTOCOL == 'auto' else ()
+    return f'http://{next(iter(hosts))}{_RES_ROUTE}' if len(hosts) == 1 else None
+
+
+def check_config():
+    """启动时检查资源协议的配置"""
+    proto = hoshino.config.RES_PROTOCOL
+    if proto not in ('http', 'file', 'base64', 'auto'):
+        raise ValueError(f'RES_PROTOCOL must be one of http, file, base64, auto, but `{proto}` given')
+    if proto == 'http' and not hoshino.config.RES_URL:
+        # HOST为0.0.0.0时无从得知OneBot端可访问的地址，猜测为127.0.0.1会使远程端静默地收不到图片
+        raise ValueError(f"RES_PROTOCOL = 'http' requires RES_URL, e.g. 'http://<address reachable by OneBot>:"
+                         f"{hoshino.config.PORT}{_RES_ROUTE}' to use the builtin route, or use RES_PROTOCOL = 'auto'")
+
+
+def should_mount() -> bool:
+    """auto模式下RES_URL留空，或RES_URL指向bot自身的`/res/`路由时，需由bot提供RES_DIR下的文件"""
+    proto, url = hoshino.config.RES_PROTOCOL, hoshino.config.RES_URL
+    if proto == 'auto' and not url:
+        return True
+    return proto in ('http', 'auto') and urlparse(url).path == _RES_ROUTE
+
+
+def mount(app):
+    """由bot自身的http服务在`/res/`下提供RES_DIR下的文件"""
+    from quart import send_from_directory
+    res_dir = os.path.abspath(os.path.expanduser(hoshino.config.RES_DIR))
+
+    async def serve_res(filename):
+        return await send_from_directory(res_dir, filename)
+
+    app.add_url_rule(f'{_RES_ROUTE}<path:filename>', 'hoshino_res', serve_res, methods=['GET'])
+    hoshino.logger.info(f'Resources served at {_RES_ROUTE}')
+
+
 class ResObj:
     def __init__(self, res_path):
         res_dir = os.path.expanduser(hoshino.config.RES_DIR)
@@ -19,38 +282,74 @@ class ResObj:
     @property
     def url(self):
         """资源文件的url，供Onebot（或其他远程服务）使用"""
-        return urljoin(hoshino.config.RES_URL, pathname2url(self.__path))
+        base = hoshino.config.RES_URL or _builtin_res_url()
+        if base is None:
+            raise ValueError('RES_URL is empty and no address reachable by OneBot is known')
+        return urljoin(base, pathname2url(self.__path))
 
     @property
     def path(self):
         """资源文件的路径，供Hoshino内部使用"""
         return os.path.join(hoshino.config.RES_DIR, self.__path)
 
+    @property
+    def uri(self):
+        """按资源协议返回url或file://路径，供图片等消息段使用，见`protocol`"""
+        if protocol() == 'http':
+            return self.url
+        return f'file:///{os.path.abspath(self.path)}'
+
     @property
     def exist(self):
-        return os.path.exists(self.path)
+        return index.exists(self.__path)
+
+    @property
+    def files(self) -> List[str]:
+        """目录下的全部文件名"""
+        return index.listdir(self.__path)
+
+    def register(self):
+        """hoshino写入该资源文件后调用，使其立即被索引"""
+        index.add(self.__path)
+        image_cache.invalidate(self.path)
+
+    def random_file(self) -> Optional["ResObj"]:
+        """随机返回目录下的一个文件，目录为空时返回None"""
+        name = index.random_file(self.__path)
+        return type(self)(os.path.join(self.__path, name)) if name else None
 
 
 class ResImg(ResObj):
     @property
     def cqcode(self) -> MessageSegment:
-        if hoshino.config.RES_PROTOCOL == 'http':
-            return MessageSegment.image(self.url)
-        elif hoshino.config.RES_PROTOCOL == 'file':
-            return MessageSegment.image(f'file:///{os.path.abspath(self.path)}')
+        if protocol() in ('http', 'file'):
+            return MessageSegment.image(self.uri)
         else:
             try:
-                return MessageSegment.image(util.pic2b64(self.open()))
+                with open(self.path, 'rb') as f:    # 直接发送原文件，无需解码再编码
+                    return MessageSegment.image(util.imgstore.to_uri(f.read()))
             except Exception as e:
                 hoshino.logger.exception(e)
                 return MessageSegment.text('[图片出错]')
 
     def open(self) -> Image:
+        """返回解码后的图片
+
+        静态图片经解码后缓存，返回的是缓存的副本，调用方可随意修改
+        """
         try:
-            return Image.open(self.path)
+            mtime_ns = os.stat(self.path).st_mtime_ns
         except FileNotFoundError:
             hoshino.logger.error(f'缺少图片资源：{self.path}')
             raise
+        img = image_cache.get(self.path, mtime_ns)
+        if img is None:
+            img = Image.open(self.path)
+            if getattr(img, 'is_animated', False):
+                return img  # 动图保留全部帧，不缓存
+            img.load()
+            image_cache.put(self.path, mtime_ns, img)
+        return img.copy()
 
 
 def get(path, *paths):
@@ -16,6 +16,18 @@ os.makedirs(os.path.expanduser('~/.hoshino'), exist_ok=True)
 logger = log.new_logger('hoshino', config.DEBUG)
 
 def init() -> HoshinoBot:
+    global _bot
+    from .importtime import ImportTimer
+    with ImportTimer() as timer:
+        _init()
+    logger.info(f'HoshinoBot initialized in {timer.total:.2f}s\n' + timer.report())
+    budget = getattr(config, 'STARTUP_TIME_BUDGET', None)
+    if budget and timer.total > budget:
+        logger.warning(f'Startup took {timer.total:.2f}s, exceeding STARTUP_TIME_BUDGET={budget}s')
+    return _bot
+
+
+def _init():
     global _bot
     nonebot.init(config)
     _bot = nonebot.get_bot()
@@ -23,9 +35,26 @@ def init() -> HoshinoBot:
     _bot.get_self_ids = get_self_ids
     _bot.silence = util.silence
 
-    from .log import error_handler, critical_handler
-    nonebot.logger.addHandler(error_handler)
-    nonebot.logger.addHandler(critical_handler)
+    nonebot.logger.addHandler(log.error_queue_handler)
+    log.set_rotation(getattr(config, 'LOG_MAX_BYTES', 0), getattr(config, 'LOG_BACKUP_COUNT', 5))
+
+    from . import grouplist, sender
+    grouplist.setup(_bot)
+    sender.install(_bot)
+
+    from . import metrics
+    metrics_route = getattr(config, 'METRICS_ROUTE', None)
+    if metrics_route:
+        metrics.mount(_bot.server_app, metrics_route, getattr(config, 'METRICS_TOKEN', None))
+
+    from . import R
+    R.check_config()
+    R.index.rescan()
+    nonebot.scheduler.add_job(R.index.refresh, 'interval', seconds=getattr(config, 'RES_INDEX_INTERVAL', 60))
+    if config.RES_PROTOCOL == 'auto':
+        R.track_peers(_bot.server_app)
+    if R.should_mount():
+        R.mount(_bot.server_app)
 
     for module_name in config.MODULES_ON:
         nonebot.load_plugins(
@@ -34,8 +63,6 @@ def init() -> HoshinoBot:
 
     from . import msghandler
 
-    return _bot
-
 
 async def _finish(event, message, **kwargs):
     if message:
@@ -0,0 +1,117 @@
+"""并发、限速的群消息推送
+
+各群的推送并发进行，每个bot账号的发送频率由令牌桶限制（`BROADCAST_RATE`条/秒，
+允许`BROADCAST_BURST`条突发），令牌桶在所有推送间共享，多个服务同时推送也不会超速。
+每条消息经`hoshino.sender`选出群内负载最低的健康账号发送，同一群的多条消息按顺序发送；
+`ActionFailed`时退避重试，失败的账号计入其负载，重试时会优先换用其他账号。
+"""
+
+import asyncio
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+from aiocqhttp import ActionFailed
+
+import hoshino
+from hoshino import sender
+from hoshino.typing import Message, MessageSegment
+
+
+class TokenBucket:
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:     # 按到达顺序排队
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class BroadcastReport:
+
+    def __init__(self, tag: str, total: int):
+        self.tag = tag
+        self.total = total
+        self.delivered: List[int] = []
+        self.failed: Dict[int, str] = {}   # {group_id: 错误信息}
+        self.retries = 0
+        self.elapsed = 0.0
+
+    def __str__(self):
+        return (f'{self.tag or "broadcast"}: {len(self.delivered)}/{self.total}个群投递成功，'
+                f'{len(self.failed)}个失败，重试{self.retries}次，耗时{self.elapsed:.2f}s')
+
+
+_buckets: Dict[int, TokenBucket] = {}
+
+
+def _bucket(self_id) -> TokenBucket:
+    bucket = _buckets.get(self_id)
+    if bucket is None:
+        bucket = _buckets[self_id] = TokenBucket(getattr(hoshino.config, 'BROADCAST_RATE', 2),
+                                                 getattr(hoshino.config, 'BROADCAST_BURST', 5))
+    return bucket
+
+
+async def broadcast(groups: Dict[int, List[int]], msgs, tag='', interval_time=0.5,
+                    randomiser: Optional[Callable] = None, logger=None) -> BroadcastReport:
+    """向`groups`（{group_id: [可用的self_id]}）推送消息
+
+    `interval_time`为同一群内相邻两条消息的间隔。
+    """
+    bot = hoshino.get_bot()
+    logger = logger or hoshino.logger
+    if isinstance(msgs, (str, MessageSegment, Message)):
+        msgs = (msgs, )
+    retries = getattr(hoshino.config, 'BROADCAST_RETRIES', 2)
+    report = BroadcastReport(tag, len(groups))
+    load = Counter()
+    start = time.perf_counter()
+
+    async def send(gid, selfids, msg):
+        for attempt in range(retries + 1):
+            sid = sender.selector.choose(selfids, load)
+            load[sid] += 1
+            try:
+                await _bucket(sid).acquire()
+                await bot.send_group_msg(self_id=sid, group_id=gid, message=msg)
+                return
+            except ActionFailed:
+                if attempt == retries:
+                    raise
+                report.retries += 1
+                await asyncio.sleep(2 ** attempt)
+            finally:
+                load[sid] -= 1
+
+    async def deliver(gid, selfids):
+        try:
+            for i, msg in enumerate(msgs):
+                if i and interval_time:
+                    await asyncio.sleep(interval_time)
+                msg = randomiser(msg) if randomiser else msg
+                await send(gid, selfids, msg)
+            report.delivered.append(gid)
+            if msgs:
+                logger.info(f"群{gid} 投递{tag}成功 共{len(msgs)}条消息")
+        except Exception as e:
+            report.failed[gid] = repr(e)
+            logger.error(f"群{gid} 投递{tag}失败：{type(e)}")
+            logger.exception(e)
+
+    await asyncio.gather(*(deliver(gid, selfids) for gid, selfids in groups.items()))
+    report.elapsed = time.perf_counter() - start
+    logger.info(str(report))
+    return report
@@ -19,13 +19,82 @@ COMMAND_START = {''}    # 命令前缀（空字符串匹配任何消息）
 COMMAND_SEP = set()     # 命令分隔符（hoshino不需要该特性，保持为set()即可）
 
 # 发送图片的协议
-# 可选 http, file, base64
+# 可选 http, file, base64, auto
 # 当QQ客户端与bot端不在同一台计算机时，可用http协议
+# auto按OneBot端的连接来源自动选择：均在本机时用file；否则用http（RES_URL留空时使用bot自身的`/res/`路由，
+# 地址取自OneBot端连接bot时所用的地址）；无法确定时用base64
 RES_PROTOCOL = 'file'
 # 资源库文件夹，需可读可写，windows下注意反斜杠转义
 RES_DIR = r'./res/'
-# 使用http协议时需填写，原则上该url应指向RES_DIR目录
+# 使用http协议时必须填写，原则上该url应指向RES_DIR目录
+# 填写为bot自身的`http://<OneBot端可访问的地址>:<PORT>/res/`时，由bot自身的http服务提供RES_DIR中的文件
+# auto协议下可留空，此时使用OneBot端连接bot时所用的地址
 RES_URL = 'http://127.0.0.1:5000/static/'
+# 使用file或http协议时，渲染出的图片保存于RES_DIR/rendered/并以路径或url发送，总大小超出该值时淘汰最久未用的
+RENDERED_CACHE_BYTES = 256 * 1024 * 1024
+# RES_DIR的文件索引每隔该时间（秒）检查一次目录变化；手动增删资源后也可发送`rescan`立即重建
+RES_INDEX_INTERVAL = 60
+# 解码后的资源图片（角色头像等）缓存的内存上限（字节）
+RES_IMAGE_CACHE_BYTES = 128 * 1024 * 1024
+# 渲染好的角色头像（含星级、专武标记）的缓存数量
+CHARA_ICON_CACHE_SIZE = 512
+# 角色头像下载：每个主机的并发连接数，以及下载失败后多久（秒）才再次尝试
+ICON_FETCH_CONCURRENCY = 4
+ICON_RETRY_INTERVAL = 3600
+# `rebuild-pcr-icon-atlas`将全部角色头像按以下尺寸打包为内存映射的图集，组队图等直接复制像素而无需解码
+ICON_ATLAS_SIZES = [64]
+
+# 启动耗时预算（秒），init()超出时输出警告，`python -m bench.startup`超出时返回失败
+STARTUP_TIME_BUDGET = 15
+
+# 同时执行的消息处理函数上限（同一群内同一服务的消息按顺序逐条处理）
+MAX_CONCURRENT_HANDLERS = 16
+# 不排队的服务（`Service(..., ordered=False)`，如猜头像等小游戏）的handler另计，上限如下
+MAX_CONCURRENT_UNORDERED_HANDLERS = 64
+
+# 多个bot账号同在一群时，同一条消息在该时间窗口（秒）内只处理一次
+DEDUP_WINDOW = 10
+# 优先响应的bot账号，靠前者优先；留空则由最先收到消息的账号响应
+PRIMARY_SELF_IDS = []
+
+# 错误日志文件达到该大小（字节）后轮转，保留LOG_BACKUP_COUNT个旧文件；0为不轮转
+LOG_MAX_BYTES = 0
+LOG_BACKUP_COUNT = 5
+
+# Prometheus格式的性能统计端点，挂载于bot的http服务上，如'/metrics'；默认关闭
+# 统计中含服务名与群号，对外开放时请设置METRICS_TOKEN，抓取时带上`Authorization: Bearer <token>`头
+METRICS_ROUTE = None
+METRICS_TOKEN = None
+
+# 图片渲染池的线程数与进程数（None为按CPU核数自动设置）
+RENDER_THREADS = None
+RENDER_PROCESSES = None
+
+# 服务开关的修改在该延迟（秒）内合并为一次写入
+SERVICE_CONFIG_FLUSH_DELAY = 1.0
+
+# bot所在群列表的缓存有效期（秒），过期后在后台刷新；bot入群/退群时即时更新
+GROUP_LIST_TTL = 600
+
+# 推送时每个bot账号的发送频率上限（条/秒）与允许的突发条数，以及发送失败时的重试次数
+BROADCAST_RATE = 2
+BROADCAST_BURST = 5
+BROADCAST_RETRIES = 2
+
+# 推送时优先选用近SENDER_WINDOW秒内发送量最少的账号；
+# 连续失败SENDER_MAX_FAILURES次的账号在SENDER_COOLDOWN秒内不再优先选用
+SENDER_WINDOW = 60
+SENDER_MAX_FAILURES = 3
+SENDER_COOLDOWN = 300
+
+# 发送图片的编码：格式可选PNG/JPEG/WEBP，JPEG/WEBP体积最小，PNG压缩等级调低可显著加快编码
+# 图表按FIGURE_DPI渲染，FIGURE_QUANTIZE开启时量化为256色以缩小体积（有损，默认关闭）；编码结果按内容缓存
+IMAGE_FORMAT = 'PNG'
+IMAGE_QUALITY = 85
+IMAGE_PNG_COMPRESS_LEVEL = 6
+FIGURE_DPI = 100
+FIGURE_QUANTIZE = False
+IMAGE_CACHE_BYTES = 32 * 1024 * 1024
 
 
 # 启用的模块
@@ -0,0 +1,98 @@
+"""多bot账号部署下的群消息去重
+
+多个Hoshino账号同在一个群时，同一条群消息会经由每个账号的连接各上报一次。
+以 (群号, 发送者, 发送时间, 消息内容) 识别同一条消息，在时间窗口内只处理一次。
+
+`to_me`按账号判定：消息@了某个账号时，只有该账号的副本`to_me`为真。
+此时其他账号的副本直接丢弃，交由被@的账号处理，以免`only_to_me`的handler被跳过；
+去重也只在`to_me`相同的副本间进行。
+
+只丢弃由其他账号上报的副本：记录每条消息首个上报的账号，同一账号再次上报相同内容
+（用户在同一秒内重复发送）时照常处理。同一事件会被消息预处理与各`on_message`多次判定，
+判定结果保存在事件上，保证一致。
+
+主响应账号策略（`PRIMARY_SELF_IDS`）：
+- 留空时由最先上报的账号处理
+- 配置后按列表顺序优先，若排名更靠前且在线的账号近期在该群上报过消息，
+  则其他账号上报的副本直接丢弃，交由该账号处理（被@的账号不受此限制）
+"""
+
+import re
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, Tuple
+
+import hoshino
+from hoshino.typing import CQEvent
+
+_MEMBER_TTL = 600   # 账号在该时长内于群中上报过消息，即视为仍在群内
+_re_at = re.compile(r'\[CQ:at,qq=(\d+)')
+
+
+class EventDeduplicator:
+
+    def __init__(self, window: float, primary: Iterable[int] = ()):
+        self.window = window
+        self.rank = {sid: i for i, sid in enumerate(primary)}
+        self._seen: "OrderedDict[Tuple, Tuple[float, int]]" = OrderedDict()  # {key: (expire_time, 首个上报的self_id)}
+        self._members: Dict[int, Dict[int, float]] = defaultdict(dict)  # {group_id: {self_id: last_seen}}
+        self.handled = 0
+        self.dropped = 0
+
+    @staticmethod
+    def _key(ev: CQEvent) -> Tuple:
+        content = ev.raw_message if ev.raw_message is not None else str(ev.message)
+        return ev.group_id, ev.user_id, ev.time, hash(content), bool(ev.to_me)
+
+    @staticmethod
+    def _at_other_bot(ev: CQEvent) -> bool:
+        """消息@了其他在线的Hoshino账号"""
+        if ev.to_me or not ev.raw_message:
+            return False
+        online = {int(sid) for sid in hoshino.get_self_ids()}
+        return any(int(qq) != ev.self_id and int(qq) in online for qq in _re_at.findall(ev.raw_message))
+
+    def _purge(self, now):
+        while self._seen:
+            key, (expire, _) = next(iter(self._seen.items()))
+            if expire > now:
+                break
+            del self._seen[key]
+
+    def _has_better_responder(self, ev: CQEvent, now) -> bool:
+        rank = self.rank.get(ev.self_id, len(self.rank))
+        online = {int(sid) for sid in hoshino.get_self_ids()}    # 连接以字符串形式的self_id登记
+        for sid, last_seen in self._members[ev.group_id].items():
+            if self.rank.get(sid, len(self.rank)) < rank and now - last_seen < _MEMBER_TTL and sid in online:
+                return True
+        return False
+
+    def should_handle(self, ev: CQEvent) -> bool:
+        """返回False表示该事件是其他账号已（或将要）处理的副本"""
+        if ev.detail_type != 'group' or len(hoshino.get_self_ids()) <= 1:
+            return True
+        decision = ev.get('_dedup')
+        if decision is None:
+            decision = ev['_dedup'] = self._decide(ev)
+        return decision
+
+    def _decide(self, ev: CQEvent) -> bool:
+        now = time.monotonic()
+        self._purge(now)
+        self._members[ev.group_id][ev.self_id] = now
+        if self._at_other_bot(ev) or (self.rank and not ev.to_me and self._has_better_responder(ev, now)):
+            self.dropped += 1
+            return False
+        key = self._key(ev)
+        seen = self._seen.get(key)
+        if seen is not None and seen[1] != ev.self_id:
+            self.dropped += 1
+            return False
+        if seen is None:
+            self._seen[key] = (now + self.window, ev.self_id)
+        self.handled += 1
+        return True
+
+
+dedup = EventDeduplicator(getattr(hoshino.config, 'DEDUP_WINDOW', 10),
+                          getattr(hoshino.config, 'PRIMARY_SELF_IDS', ()))
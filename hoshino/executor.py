@@ -0,0 +1,113 @@
+"""ServiceFunc的执行层
+
+触发器匹配到的ServiceFunc与`Service.on_message`注册的群消息handler都经由此处执行：
+同一群内同一服务的消息按到达顺序依次处理（如会战`!出刀`的报刀顺序不会错乱），
+不同群、不同服务之间并行处理，并以全局信号量限制同时执行的handler数量。
+
+小游戏等长时间等待用户输入的服务以`Service(..., ordered=False)`声明，
+其handler不排队，以免阻塞同群同服务的其他消息；这类handler会长时间sleep等待作答，
+因此不占用全局并发名额，而是另受`MAX_CONCURRENT_UNORDERED_HANDLERS`限制，
+同时进行的游戏再多也不会阻塞其他群的消息处理。
+
+每个handler都在提交时的上下文（`contextvars`）中执行，
+`bot.send`据此找到接收该消息的websocket连接，回复不会经由其他账号发出。
+"""
+
+import asyncio
+import contextvars
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Hashable, Optional, Tuple
+
+import hoshino
+
+_Item = Tuple[float, contextvars.Context, Callable[..., Awaitable], tuple]
+
+
+class GroupExecutor:
+
+    def __init__(self, max_concurrency: int, max_unordered: int):
+        self.max_concurrency = max_concurrency
+        self.max_unordered = max_unordered
+        self._semaphore = None  # 需在事件循环内创建
+        self._unordered_semaphore = None
+        self._queues: Dict[Hashable, Deque[_Item]] = {}
+        self._running = 0
+        self._running_unordered = 0
+        self._submitted = 0
+        self._finished = 0
+        self._wait_max = 0.0
+        self._waits = deque(maxlen=1000)    # 最近的排队耗时，用于统计分位数
+
+    def submit(self, key: Optional[Hashable], func: Callable[..., Awaitable], *args):
+        """将`func(*args)`加入队列`key`（如`(group_id, 服务名)`），立即返回
+
+        `key`为None时不排队，只等待不排队handler的并发名额。
+        """
+        self._submitted += 1
+        item = (time.perf_counter(), contextvars.copy_context(), func, args)
+        if key is None:
+            if self._unordered_semaphore is None:
+                self._unordered_semaphore = asyncio.Semaphore(self.max_unordered)
+            asyncio.ensure_future(self._run(item, self._unordered_semaphore, ordered=False))
+            return
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque([item])
+            asyncio.ensure_future(self._work(key, queue))
+        else:
+            queue.append(item)
+
+    async def _work(self, key, queue):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        try:
+            while queue:
+                await self._run(queue.popleft(), self._semaphore)
+        finally:
+            del self._queues[key]
+
+    async def _run(self, item: _Item, semaphore: asyncio.Semaphore, ordered=True):
+        enqueued, ctx, func, args = item
+        async with semaphore:
+            wait = time.perf_counter() - enqueued
+            self._waits.append(wait)
+            self._wait_max = max(self._wait_max, wait)
+            if ordered:
+                self._running += 1
+            else:
+                self._running_unordered += 1
+            try:
+                # 在提交时的上下文中新建Task，而非沿用队列首个事件的上下文
+                await ctx.run(asyncio.ensure_future, func(*args))
+            except Exception as e:
+                hoshino.logger.exception(e)
+            finally:
+                if ordered:
+                    self._running -= 1
+                else:
+                    self._running_unordered -= 1
+                self._finished += 1
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+        def percentile(p):
+            return waits[min(len(waits) - 1, int(len(waits) * p))] if waits else 0.0
+        depth = {key: len(q) for key, q in self._queues.items() if q}
+        return {
+            'max_concurrency': self.max_concurrency,
+            'max_unordered': self.max_unordered,
+            'running': self._running,
+            'running_unordered': self._running_unordered,
+            'pending': sum(depth.values()),
+            'queue_depth': depth,
+            'submitted': self._submitted,
+            'finished': self._finished,
+            'wait_p50': percentile(0.5),
+            'wait_p99': percentile(0.99),
+            'wait_max': self._wait_max,
+        }
+
+
+executor = GroupExecutor(getattr(hoshino.config, 'MAX_CONCURRENT_HANDLERS', 16),
+                         getattr(hoshino.config, 'MAX_CONCURRENT_UNORDERED_HANDLERS', 64))
@@ -0,0 +1,84 @@
+"""各bot账号所在群列表的缓存
+
+`Service.get_enable_groups`等需要群列表时不再逐账号调用`get_group_list`：
+- 缓存按self_id保存，有效期`GROUP_LIST_TTL`秒
+- 过期后仍先返回旧列表，同时在后台刷新；同一账号同时只有一个刷新请求
+- bot自身入群/退群（`group_increase`/`group_decrease`）时立即更新缓存
+
+账号连接以字符串形式的self_id登记，事件中则为int，缓存统一以int为键。
+"""
+
+import asyncio
+import time
+from typing import Dict, FrozenSet
+
+import hoshino
+from hoshino.typing import CQEvent, CQHttpError
+
+
+class GroupListCache:
+
+    def __init__(self, ttl: float = 600):
+        self.ttl = ttl
+        self._groups: Dict[int, FrozenSet[int]] = {}    # {self_id: 群号集合}
+        self._expire: Dict[int, float] = {}
+        self._refreshing: Dict[int, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _refresh(self, self_id) -> asyncio.Task:
+        task = self._refreshing.get(self_id)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(self_id))
+            self._refreshing[self_id] = task
+        return task
+
+    async def _fetch(self, self_id) -> FrozenSet[int]:
+        try:
+            gl = await hoshino.get_bot().get_group_list(self_id=self_id)
+            groups = frozenset(g['group_id'] for g in gl)
+            self._groups[self_id] = groups
+            self._expire[self_id] = time.monotonic() + self.ttl
+            return groups
+        except CQHttpError as e:
+            hoshino.logger.error(f'获取bot {self_id} 的群列表失败：{type(e)}')
+            return self._groups.get(self_id, frozenset())
+        finally:
+            del self._refreshing[self_id]
+
+    async def get(self, self_id) -> FrozenSet[int]:
+        """返回账号所在的全部群号"""
+        self_id = int(self_id)
+        groups = self._groups.get(self_id)
+        if groups is None:
+            self.misses += 1
+            return await asyncio.shield(self._refresh(self_id))
+        self.hits += 1
+        if time.monotonic() >= self._expire[self_id]:
+            self._refresh(self_id)
+        return groups
+
+    def invalidate(self, self_id=None):
+        """令缓存过期，下次访问时刷新"""
+        for sid in ([int(self_id)] if self_id is not None else list(self._expire)):
+            if sid in self._expire:
+                self._expire[sid] = 0
+
+    def on_notice(self, ev: CQEvent):
+        if ev.user_id != ev.self_id or ev.self_id not in self._groups:
+            return
+        groups = self._groups[ev.self_id]
+        if ev.notice_type == 'group_increase':
+            self._groups[ev.self_id] = groups | {ev.group_id}
+        elif ev.notice_type == 'group_decrease':
+            self._groups[ev.self_id] = groups - {ev.group_id}
+        self.invalidate(ev.self_id)     # 以防漏收通知，随后在后台核对一次
+
+
+group_list = GroupListCache(getattr(hoshino.config, 'GROUP_LIST_TTL', 600))
+
+
+def setup(bot):
+    @bot.on_notice('group_increase', 'group_decrease')
+    async def _update_group_list(ev: CQEvent):
+        group_list.on_notice(ev)
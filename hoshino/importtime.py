@@ -0,0 +1,89 @@
+"""模块导入耗时统计
+
+作为`sys.meta_path`中的finder记录其间每个模块的导入耗时，
+效果类似`python -X importtime`，但可在运行中对指定代码段开启。
+
+    with ImportTimer() as timer:
+        import something
+    print(timer.report())
+"""
+
+import importlib.abc
+import importlib.machinery
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+_TIMEABLE_LOADERS = (
+    importlib.machinery.SourceFileLoader,
+    importlib.machinery.SourcelessFileLoader,
+    importlib.machinery.ExtensionFileLoader,
+)
+
+
+class ImportTimer(importlib.abc.MetaPathFinder):
+
+    def __init__(self):
+        self.records: Dict[str, Tuple[float, float]] = {}   # {module: (cumulative, self)}
+        self._children: List[float] = []
+        self._patched: List[Tuple[object, Optional[Callable]]] = []    # [(loader, 原先实例上的exec_module)]
+        self.total = 0.0
+
+    def __enter__(self):
+        sys.meta_path.insert(0, self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.total = time.perf_counter() - self._start
+        sys.meta_path.remove(self)
+        for loader, original in reversed(self._patched):   # 还原loader，此后的导入或reload不再经过计时
+            if original is None:
+                loader.__dict__.pop('exec_module', None)
+            else:
+                loader.exec_module = original
+        self._patched.clear()
+        return False
+
+    def find_spec(self, fullname, path, target=None):
+        # 嵌套计时时只有最前面的ImportTimer会被调用，由它代为其余ImportTimer计时，
+        # 查找时须跳过所有ImportTimer，否则会互相调用而无限递归
+        timers = []
+        for finder in sys.meta_path:
+            if isinstance(finder, ImportTimer):
+                timers.append(finder)
+                continue
+            if not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if isinstance(spec.loader, _TIMEABLE_LOADERS):
+            self._patched.append((spec.loader, spec.loader.__dict__.get('exec_module')))
+            for timer in timers:
+                spec.loader.exec_module = timer._timed(fullname, spec.loader.exec_module)
+        return spec
+
+    def _timed(self, fullname, exec_module):
+        def wrapper(module):
+            self._children.append(0.0)
+            start = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                cumulative = time.perf_counter() - start
+                children = self._children.pop()
+                if self._children:
+                    self._children[-1] += cumulative
+                self.records[fullname] = (cumulative, cumulative - children)
+        return wrapper
+
+    def report(self, top: int = 15) -> str:
+        items = sorted(self.records.items(), key=lambda x: x[1][1], reverse=True)[:top]
+        lines = [f'Imported {len(self.records)} modules in {self.total:.3f}s, top {len(items)} by self time:',
+                 f'{"self(ms)":>10} {"cumul(ms)":>10}  module']
+        for name, (cumulative, self_) in items:
+            lines.append(f'{self_ * 1000:10.1f} {cumulative * 1000:10.1f}  {name}')
+        return '\n'.join(lines)
@@ -1,6 +1,15 @@
+"""日志
+
+所有logger共享一个`QueueHandler`，日志记录只在调用方线程中入队，
+格式化与终端/文件写入均由后台线程完成，不会阻塞事件循环。
+"""
+
+import atexit
 import logging
 import os
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 os.makedirs('./log', exist_ok=True)
 _error_log_file = os.path.expanduser('./log/error.log')
@@ -9,18 +18,51 @@ _critical_log_file = os.path.expanduser('./log/critical.log')
 formatter = logging.Formatter('[%(asctime)s %(name)s] %(levelname)s: %(message)s')
 default_handler = logging.StreamHandler(sys.stdout)
 default_handler.setFormatter(formatter)
-error_handler = logging.FileHandler(_error_log_file, encoding='utf8')
+error_handler = RotatingFileHandler(_error_log_file, encoding='utf8', delay=True)
 error_handler.setLevel(logging.ERROR)
 error_handler.setFormatter(formatter)
-critical_handler = logging.FileHandler(_critical_log_file, encoding='utf8')
+critical_handler = RotatingFileHandler(_critical_log_file, encoding='utf8', delay=True)
 critical_handler.setLevel(logging.CRITICAL)
 critical_handler.setFormatter(formatter)
 
 
+class _QueueHandler(QueueHandler):
+    def prepare(self, record):
+        # 保留原始的异常信息交由后台线程格式化，只确保消息参数已被求值
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+_queue = queue.SimpleQueue()
+queue_handler = _QueueHandler(_queue)
+_listener = QueueListener(_queue, default_handler, error_handler, critical_handler, respect_handler_level=True)
+_listener.start()
+
+# 供nonebot的logger使用：nonebot自带终端输出，只需转发错误日志至文件
+_error_queue = queue.SimpleQueue()
+error_queue_handler = _QueueHandler(_error_queue)
+error_queue_handler.setLevel(logging.ERROR)
+_error_listener = QueueListener(_error_queue, error_handler, critical_handler, respect_handler_level=True)
+_error_listener.start()
+
+
+@atexit.register
+def _stop_listeners():
+    _listener.stop()
+    _error_listener.stop()
+
+
+def set_rotation(max_bytes: int, backup_count: int = 5):
+    """按文件大小轮转错误日志，`max_bytes`为0时不轮转"""
+    for handler in (error_handler, critical_handler):
+        handler.maxBytes = max_bytes
+        handler.backupCount = backup_count
+
+
 def new_logger(name, debug=True):
     logger = logging.getLogger(name)
-    logger.addHandler(default_handler)
-    logger.addHandler(error_handler)
-    logger.addHandler(critical_handler)
+    if queue_handler not in logger.handlers:
+        logger.addHandler(queue_handler)
     logger.setLevel(logging.DEBUG if debug else logging.INFO)
     return logger
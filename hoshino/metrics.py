@@ -0,0 +1,134 @@
+"""按服务与函数统计的调用次数、错误次数与耗时分布
+
+记录开销仅为一次字典查找与几次整数累加，汇总与格式化只在被查询时进行。
+数据可通过超级用户命令`metrics`查看，或在配置`METRICS_ROUTE`后以Prometheus文本格式抓取。
+"""
+
+import hmac
+import time
+from bisect import bisect_left
+from typing import Dict, Tuple
+
+import hoshino
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float('inf'))
+
+
+class Metric:
+    __slots__ = ('calls', 'errors', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+    def observe(self, seconds: float, error: bool):
+        self.calls += 1
+        self.errors += error
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+
+
+_metrics: Dict[Tuple[str, str, str], Metric] = {}   # {(kind, service, func): metric}
+
+
+def observe(kind: str, service: str, func: str, seconds: float, error: bool = False):
+    """记录一次调用，`kind`为message, command, scheduled_job或broadcast"""
+    key = (kind, service, func)
+    m = _metrics.get(key)
+    if m is None:
+        m = _metrics[key] = Metric()
+    m.observe(seconds, error)
+
+
+class timer:
+    """计时并记录调用，块内抛出的异常计为错误
+
+    >>> with metrics.timer('message', sv.name, func.__name__):
+    ...     await func(bot, ev)
+    """
+    __slots__ = ('key', 'start')
+
+    def __init__(self, kind: str, service: str, func: str):
+        self.key = (kind, service, func)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(*self.key, time.perf_counter() - self.start, exc_type is not None and not _is_flow_control(exc_type))
+        return False
+
+
+def _is_flow_control(exc_type) -> bool:
+    # bot.finish与会话的pause/finish借由异常实现，不计为错误
+    from nonebot.command import SwitchException, _FinishException, _PauseException
+    from nonebot.message import CanceledException
+    return issubclass(exc_type, (CanceledException, _FinishException, _PauseException, SwitchException))
+
+
+def summary(top: int = 10, sort_by: str = 'total') -> str:
+    items = sorted(_metrics.items(), key=lambda x: getattr(x[1], sort_by), reverse=True)[:top]
+    if not items:
+        return '暂无统计数据'
+    lines = [f'按{sort_by}排序前{len(items)}项：']
+    for (kind, service, func), m in items:
+        avg = m.total / m.calls if m.calls else 0
+        lines.append(f'[{kind}] {service}.{func}\n'
+                     f'  调用{m.calls} 错误{m.errors} 总计{m.total:.2f}s 平均{avg*1000:.1f}ms 最大{m.max*1000:.1f}ms')
+    return '\n'.join(lines)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def render_prometheus() -> str:
+    lines = [
+        '# HELP hoshino_calls_total Number of handler calls.',
+        '# TYPE hoshino_calls_total counter',
+    ]
+    labels = {key: 'kind="{}",service="{}",func="{}"'.format(*map(_escape, key)) for key in _metrics}
+    metrics = list(_metrics.items())
+    lines.extend(f'hoshino_calls_total{{{labels[key]}}} {m.calls}' for key, m in metrics)
+    lines.append('# HELP hoshino_errors_total Number of handler calls that raised.')
+    lines.append('# TYPE hoshino_errors_total counter')
+    lines.extend(f'hoshino_errors_total{{{labels[key]}}} {m.errors}' for key, m in metrics)
+    lines.append('# HELP hoshino_latency_seconds Handler latency.')
+    lines.append('# TYPE hoshino_latency_seconds histogram')
+    for key, m in metrics:
+        cumulative = 0
+        for le, n in zip(BUCKETS, m.buckets):
+            cumulative += n
+            le = '+Inf' if le == float('inf') else repr(le)
+            lines.append(f'hoshino_latency_seconds_bucket{{{labels[key]},le="{le}"}} {cumulative}')
+        lines.append(f'hoshino_latency_seconds_sum{{{labels[key]}}} {m.total}')
+        lines.append(f'hoshino_latency_seconds_count{{{labels[key]}}} {m.calls}')
+
+    from hoshino.executor import executor
+    st = executor.stats()
+    lines.append('# TYPE hoshino_executor_running gauge')
+    lines.append(f'hoshino_executor_running {st["running"]}')
+    lines.append('# TYPE hoshino_executor_pending gauge')
+    lines.append(f'hoshino_executor_pending {st["pending"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def mount(app, route: str, token: str = None):
+    """在bot的ASGI应用上挂载Prometheus抓取端点
+
+    `token`非空时，请求须带有`Authorization: Bearer <token>`头
+    """
+    from quart import request
+
+    async def prometheus_metrics():
+        if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return 'Unauthorized', 401, {'WWW-Authenticate': 'Bearer'}
+        return render_prometheus(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+    app.add_url_rule(route, 'hoshino_metrics', prometheus_metrics, methods=['GET'])
+    hoshino.logger.info(f'Metrics endpoint mounted at {route}')
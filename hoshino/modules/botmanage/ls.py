@@ -1,5 +1,7 @@
 from nonebot.argparse import ArgumentParser
-from hoshino import Service, sucmd
+from hoshino import R, Service, sucmd, trigger
+from hoshino.executor import executor
+from hoshino.sender import selector
 from hoshino.typing import CommandSession
 
 
@@ -37,7 +39,42 @@ async def ls_service(session: CommandSession, service_name: str):
 
 async def ls_bot(session: CommandSession):
     self_ids = session.bot.get_self_ids()
-    await session.send(f"共{len(self_ids)}个bot\n{self_ids}")
+    st = selector.stats()
+    lines = []
+    for sid in self_ids:
+        s = st.get(int(sid))
+        if s:
+            lines.append(f"{sid} 近{selector.window}s发送{s['recent']}条 连续失败{s['failures']}次" + ("" if s['healthy'] else " 冷却中"))
+        else:
+            lines.append(f"{sid} 无发送记录")
+    await session.send(f"共{len(self_ids)}个bot\n" + "\n".join(lines))
+
+
+async def ls_trigger(session: CommandSession):
+    stats = trigger.text_stats
+    n = stats['event']
+    skipped = n - stats['norm_text']
+    rate = skipped / n if n else 0
+    await session.send(f"共处理{n}条群消息\n提取纯文本{stats['plain_text']}次\n规范化{stats['norm_text']}次，跳过{skipped}次（{rate:.1%}）")
+
+
+async def ls_executor(session: CommandSession):
+    st = executor.stats()
+    busy = sorted(st['queue_depth'].items(), key=lambda x: -x[1])[:5]
+    busy = '\n'.join(f'{gid} {sv}: {n}' for (gid, sv), n in busy)
+    await session.send(f"执行中{st['running']}/{st['max_concurrency']} 排队{st['pending']}\n"
+                       f"不排队的执行中{st['running_unordered']}/{st['max_unordered']}\n"
+                       f"已提交{st['submitted']} 已完成{st['finished']}\n"
+                       f"排队耗时 p50={st['wait_p50']*1000:.1f}ms p99={st['wait_p99']*1000:.1f}ms max={st['wait_max']*1000:.1f}ms"
+                       + (f"\n排队最多的群与服务：\n{busy}" if busy else ""))
+
+
+async def ls_res(session: CommandSession):
+    st = R.image_cache.stats()
+    n = st['hits'] + st['misses']
+    rate = st['hits'] / n if n else 0
+    await session.send(f"图片缓存：{st['images']}张 {st['size'] / 2**20:.1f}/{st['max_bytes'] / 2**20:.0f}MiB\n"
+                       f"命中{st['hits']} 未命中{st['misses']}（命中率{rate:.1%}） 淘汰{st['evictions']}")
 
 
 @sucmd('ls', shell_like=True)
@@ -48,6 +85,9 @@ async def ls(session: CommandSession):
     switch.add_argument('-f', '--friend', action='store_true')
     switch.add_argument('-b', '--bot', action='store_true')
     switch.add_argument('-s', '--service')
+    switch.add_argument('-t', '--trigger', action='store_true')
+    switch.add_argument('-e', '--executor', action='store_true')
+    switch.add_argument('-r', '--res', action='store_true')
     args = parser.parse_args(session.argv)
 
     if args.group:
@@ -58,3 +98,9 @@ async def ls(session: CommandSession):
         await ls_bot(session)
     elif args.service:
         await ls_service(session, args.service)
+    elif args.trigger:
+        await ls_trigger(session)
+    elif args.executor:
+        await ls_executor(session)
+    elif args.res:
+        await ls_res(session)
@@ -0,0 +1,10 @@
+from hoshino import metrics, sucmd
+from hoshino.typing import CommandSession
+
+
+@sucmd('metrics', force_private=False, aliases=('性能统计', ))
+async def show_metrics(session: CommandSession):
+    sort_by = session.current_arg_text.strip() or 'total'
+    if sort_by not in ('total', 'calls', 'errors', 'max'):
+        session.finish('Usage: metrics [total|calls|errors|max]')
+    await session.send(metrics.summary(sort_by=sort_by))
@@ -0,0 +1,39 @@
+import asyncio
+
+from hoshino import sucmd
+from hoshino.profiler import profiler
+from hoshino.typing import CommandSession
+
+MAX_SECONDS = 300
+
+
+def _report(duration: float) -> str:
+    filename = profiler.dump()
+    idle = profiler.idle / profiler.samples if profiler.samples else 0
+    lines = [f'采样{duration:.1f}s 共{profiler.samples}个样本，事件循环空闲{idle:.1%}', f'已保存至{filename}',
+             '最热的栈帧（自身/累计，不含空闲）：']
+    for label, self_n, total_n in profiler.top(10):
+        lines.append(f'{self_n / profiler.samples:6.1%} {total_n / profiler.samples:6.1%} {label}')
+    return '\n'.join(lines)
+
+
+@sucmd('profile', force_private=False, aliases=('性能分析', ))
+async def profile(session: CommandSession):
+    arg = session.current_arg_text.strip()
+    if arg == 'stop':
+        if not profiler.running:
+            session.finish('性能分析未在运行')
+        await session.send(_report(profiler.stop()))
+        return
+    if arg and not arg.isdigit() and arg != 'start':
+        session.finish(f'Usage: profile [秒数(<={MAX_SECONDS})|start|stop]')
+    if profiler.running:
+        session.finish('性能分析已在运行，发送`profile stop`结束')
+    run_id = profiler.start()
+    if arg == 'start':
+        session.finish('性能分析已开始，发送`profile stop`结束')
+    seconds = min(int(arg or 10), MAX_SECONDS)
+    await session.send(f'性能分析已开始，{seconds}秒后汇报结果')
+    await asyncio.sleep(seconds)
+    if profiler.running and profiler.run_id == run_id:  # 期间被stop或已开始新的采样时不汇报
+        await session.send(_report(profiler.stop()))
@@ -0,0 +1,12 @@
+import time
+
+from hoshino import R, sucmd
+from hoshino.typing import CommandSession
+
+
+@sucmd('rescan', force_private=False, aliases=('重载资源', ))
+async def rescan_res(session: CommandSession):
+    start = time.perf_counter()
+    n = R.index.rescan()
+    R.image_cache.clear()
+    await session.send(f'资源索引已重建：共{n}个文件，耗时{time.perf_counter() - start:.2f}s')
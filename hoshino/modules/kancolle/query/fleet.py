@@ -1,13 +1,11 @@
-import os
 import re
-import random
 
 from hoshino import util, R
 
 from . import sv
 
-ship_folder = R.img('kancolle/ship/').path
-equip_folder = R.img('kancolle/equip/').path
+ship_folder = R.img('kancolle/ship/')
+equip_folder = R.img('kancolle/equip/')
 
 def _load_data():
     config = util.load_config(__file__)
@@ -25,24 +23,16 @@ DB = _load_data()
 
 @sv.on_fullmatch('随机舰娘')
 async def random_ship(bot, ev):
-    filelist = os.listdir(ship_folder)
-    path = None
-    while not path or not os.path.isfile(path):
-        filename = random.choice(filelist)
-        path = os.path.join(ship_folder, filename)
-    pic = R.img('kancolle/ship/', filename).cqcode
-    await bot.send(ev, pic, at_sender=True)
+    res = ship_folder.random_file()
+    if res:
+        await bot.send(ev, res.cqcode, at_sender=True)
 
 
 @sv.on_fullmatch('随机装备')
 async def random_equip(bot, ev):
-    filelist = os.listdir(equip_folder)
-    path = None
-    while not path or not os.path.isfile(path):
-        filename = random.choice(filelist)
-        path = os.path.join(equip_folder, filename)
-    pic = R.img('kancolle/equip/', filename).cqcode
-    await bot.send(ev, pic, at_sender=True)
+    res = equip_folder.random_file()
+    if res:
+        await bot.send(ev, res.cqcode, at_sender=True)
 
 
 @sv.on_prefix('*')
@@ -40,6 +40,7 @@ async def get_img(yy, mm, ss):
             if re.search(r'image', resp.headers['content-type'], re.I):
                 i = Image.open(BytesIO(await resp.content))
                 i.save(img.path)
+                img.register()
     return img if img.exist else None
 
 syntax_rex = re.compile(r'^\d{6}$')
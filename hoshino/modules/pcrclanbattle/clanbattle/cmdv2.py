@@ -13,7 +13,6 @@ import os
 import asyncio
 from datetime import datetime, timedelta
 from typing import List
-from matplotlib import pyplot as plt
 try:
     import ujson as json
 except:
@@ -31,8 +30,17 @@ from .argparse.argtype import *
 from .battlemaster import BattleMaster
 from .exception import *
 
-plt.style.use('seaborn-pastel')
-plt.rcParams['font.family'] = ['DejaVuSans', 'Microsoft YaHei', 'SimSun', ]
+_plt = None
+
+def _pyplot():
+    """首次绘图时才导入matplotlib并设置样式"""
+    global _plt
+    if _plt is None:
+        from matplotlib import pyplot as plt
+        plt.style.use('seaborn-pastel')
+        plt.rcParams['font.family'] = ['DejaVuSans', 'Microsoft YaHei', 'SimSun', ]
+        _plt = plt
+    return _plt
 
 USAGE_ADD_CLAN = '!建会 N公会名 S服务器代号'
 USAGE_ADD_MEMBER = '!入会 昵称 (@qq)'
@@ -702,6 +710,7 @@ async def stat_damage(bot:NoneBot, ctx:Context_T, args:ParseResult):
     ]
 
     # generate statistic figure
+    plt = _pyplot()
     fig, ax = plt.subplots()
     fig.set_size_inches(10, y_size)
     ax.set_title(f"{clan['name']}{yyyy}年{mm}月会战伤害统计")
@@ -722,7 +731,7 @@ async def stat_damage(bot:NoneBot, ctx:Context_T, args:ParseResult):
             if d > unit:
                 ax.text(x, y, f'{d/unit:.0f}{unit_str}', ha='center', va='center')
     plt.subplots_adjust(left=0.12, right=0.96, top=1 - 0.35 / y_size, bottom=0.55 / y_size)
-    pic = util.fig2b64(plt)
+    pic = util.fig2uri(plt)
     plt.close()
     
     msg = f"{ms.image(pic)}\n※分数统计请发送“!分数统计”"
@@ -749,6 +758,7 @@ async def stat_score(bot:NoneBot, ctx:Context_T, args:ParseResult):
     #     msg.append(f"{blank}{score}分 | {name}")
 
     # generate statistic figure
+    plt = _pyplot()
     fig, ax = plt.subplots()
     score = list(map(lambda i: i[3], stat))
     yn = len(stat)
@@ -776,7 +786,7 @@ async def stat_score(bot:NoneBot, ctx:Context_T, args:ParseResult):
         w = rect.get_width()
         ax.text(w, rect.get_y() + rect.get_height() / 2, f'{w/unit:.2f}{unit_str}', ha='left', va='center')
     plt.subplots_adjust(left=0.12, right=0.96, top=1 - 0.35 / y_size, bottom=0.55 / y_size)
-    pic = util.fig2b64(plt)
+    pic = util.fig2uri(plt)
     plt.close()
 
     msg = f"{ms.image(pic)}\n※伤害统计请发送“!伤害统计”"
@@ -3,8 +3,8 @@ from time import sleep
 from typing import Iterable, List
 
 from aiocqhttp.exceptions import ActionFailed
+import hoshino
 from hoshino import util, priv
-from matplotlib import pyplot as plt
 from nonebot import NoneBot
 from nonebot import MessageSegment as ms
 from nonebot.typing import Context_T
@@ -21,8 +21,10 @@ config = util.load_config(__file__)
 lang = config["LANG"]
 L = util.load_localisation(__file__)[lang]   # Short of localisation
 
-plt.style.use(config["MATPLOTLIB_STYLE"])
-plt.rcParams['font.family'] = config["MATPLOTLIB_FONTS"]
+# 本模块不绘制图表，不再为此导入matplotlib；会战图表的样式由clanbattle.cmdv2在首次绘图时设置
+for _key in ("MATPLOTLIB_STYLE", "MATPLOTLIB_FONTS"):
+    if _key in config:
+        hoshino.logger.warning(f"clanbattle_Ti: config.json中的{_key}已不再使用，可以删除")
 
 
 def _check_clan(bm: ClanBattleManager):
@@ -0,0 +1,122 @@
+"""角色头像图集
+
+将`icon_unit_*.png`按常用尺寸预先解码、缩放，打包为每个尺寸一个的RGBA数组文件（numpy的.npy格式），
+另以`index.json`记录文件名到下标的映射及构建时各文件的mtime。启动时以内存映射方式打开，
+渲染头像时直接复制对应切片，无需解码PNG也无需缩放，内存只占用实际访问到的页。
+
+图集是可选的：未构建、或头像文件在构建后有更新（含手动替换，`get`时比对文件的mtime）时，
+`get`返回None，调用方照常读取单个文件。
+构建由`rebuild-pcr-icon-atlas`指令触发。
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from hoshino import R
+
+
+class IconAtlas:
+
+    def __init__(self):
+        self.enabled = True
+        self._arrays: Dict[int, np.ndarray] = {}    # {size: (N, size, size, 4)的内存映射数组}
+        self._slots: Dict[str, int] = {}            # {文件名: 下标}
+        self._mtimes: List[int] = []                # 构建时各头像文件的st_mtime_ns，与下标对应
+        self._stale = set()                         # 构建后被更新过的头像
+        self._lock = threading.Lock()               # 防止并发构建
+
+    @property
+    def directory(self) -> str:
+        return R.get('priconne', 'atlas').path
+
+    @property
+    def sizes(self):
+        return sorted(self._arrays)
+
+    def __len__(self):
+        return len(self._slots)
+
+    def load(self) -> bool:
+        """打开已构建的图集，不存在时返回False"""
+        index_file = os.path.join(self.directory, 'index.json')
+        if not os.path.exists(index_file):
+            return False
+        with open(index_file, encoding='utf8') as f:
+            meta = json.load(f)
+        if 'mtimes' not in meta:
+            return False    # 旧版图集无法判断头像是否更新，重新构建前不使用
+        arrays = {int(size): np.load(os.path.join(self.directory, filename), mmap_mode='r')
+                  for size, filename in meta['arrays'].items()}
+        self._arrays, self._slots, self._stale = arrays, {name: i for i, name in enumerate(meta['icons'])}, set()
+        self._mtimes = meta['mtimes']
+        return True
+
+    def get(self, filename, size) -> Optional[Image.Image]:
+        """返回缩放至`size`的头像（可修改的副本），图集中没有或文件在构建后有更新时返回None"""
+        if not self.enabled or filename in self._stale:
+            return None
+        arr = self._arrays.get(size)
+        i = self._slots.get(filename)
+        if arr is None or i is None:
+            return None
+        try:
+            mtime = os.stat(os.path.join(R.img('priconne/unit/').path, filename)).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime != self._mtimes[i]:
+            self._stale.add(filename)
+            return None
+        return Image.fromarray(np.array(arr[i]), 'RGBA')
+
+    def discard(self, filename):
+        """头像文件被更新，此后改为读取文件，直至重新构建"""
+        self._stale.add(filename)
+
+    def build(self, sizes: Iterable[int]) -> int:
+        """扫描全部头像重新构建图集，返回打包的头像数"""
+        with self._lock:
+            sizes = sorted(set(sizes))
+            unit_dir = R.img('priconne/unit/')
+            names = sorted(n for n in unit_dir.files if n.startswith('icon_unit_') and n.endswith('.png'))
+            os.makedirs(self.directory, exist_ok=True)
+            stamp = int(time.time() * 1000)
+            files = {size: f'icon_unit_{size}_{stamp}.npy' for size in sizes}
+            arrs = {size: np.lib.format.open_memmap(os.path.join(self.directory, f'{files[size]}.tmp'), mode='w+',
+                                                    dtype=np.uint8, shape=(len(names), size, size, 4))
+                    for size in sizes}
+            icons, mtimes = [], []
+            for name in names:
+                path = os.path.join(unit_dir.path, name)
+                try:
+                    mtime = os.stat(path).st_mtime_ns     # 先于读取记录，构建期间被替换的文件会视为已更新
+                    pic = Image.open(path).convert('RGBA')
+                except Exception:
+                    continue    # 损坏的图片留给逐文件读取时报错
+                for size, arr in arrs.items():
+                    arr[len(icons)] = np.asarray(pic.resize((size, size), Image.LANCZOS))
+                icons.append(name)
+                mtimes.append(mtime)
+            for arr in arrs.values():
+                arr.flush()
+            arrs.clear()    # 解除映射后才能在Windows下替换文件
+            for filename in files.values():
+                os.replace(os.path.join(self.directory, f'{filename}.tmp'), os.path.join(self.directory, filename))
+            arrays = {str(size): filename for size, filename in files.items()}
+            index_file = os.path.join(self.directory, 'index.json')
+            with open(f'{index_file}.tmp', 'w', encoding='utf8') as f:
+                json.dump({'arrays': arrays, 'icons': icons, 'mtimes': mtimes}, f)
+            os.replace(f'{index_file}.tmp', index_file)
+            self.load()
+            for name in os.listdir(self.directory):     # 清理旧图集，仍被映射时（Windows）留待下次
+                if name.endswith('.npy') and name not in arrays.values():
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
+            return len(icons)
@@ -0,0 +1,137 @@
+"""角色头像的异步下载
+
+- 同一头像同时只有一个下载请求，其余调用等待其结果
+- 同时进行的下载数由`ICON_FETCH_CONCURRENCY`限制，排队等待的时间不计入超时
+- 先写入临时文件再原子替换，不会留下半截的图片
+- 下载失败（含远端不存在该星级的头像）后`ICON_RETRY_INTERVAL`秒内不再重试
+
+渲染路径上不应等待下载：调用`fetch_background`后先使用占位头像即可，该方法可在渲染线程中调用。
+"""
+
+import asyncio
+import os
+import threading
+import time
+from io import BytesIO
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import aiohttp
+from PIL import Image
+
+import hoshino
+from hoshino import R, log
+from hoshino.util import run_in_pool
+
+logger = log.new_logger('icon_fetcher', hoshino.config.DEBUG)
+
+
+def icon_res(id_, star) -> R.ResImg:
+    return R.img(f'priconne/unit/icon_unit_{id_}{star}1.png')
+
+
+def _save_icon(data: bytes, path: str):
+    img = Image.open(BytesIO(data))
+    tmp_file = f'{path}.{threading.get_ident()}.tmp'
+    img.save(tmp_file, format='PNG')
+    os.replace(tmp_file, path)
+
+
+class IconFetcher:
+
+    def __init__(self, limit_per_host: int = 4, timeout: float = 10, retry_interval: float = 3600,
+                 on_saved: Callable[[str], None] = None):
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.on_saved = on_saved
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._inflight: Dict[Tuple[int, int], asyncio.Task] = {}
+        self._failed: Dict[Tuple[int, int], float] = {}     # {(id, star): 失败时间}
+
+    async def bind_loop(self):
+        """在事件循环中调用一次，使其他线程中的`fetch_background`可以调度下载"""
+        self._loop = asyncio.get_running_loop()
+
+    async def close(self):
+        """关闭连接池，在事件循环退出前调用；之后的下载会重新创建连接池"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._sem = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=self.limit_per_host)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def fetch(self, id_, star, force=False) -> bool:
+        """下载头像，成功时返回True；`force`为False时跳过已存在的头像"""
+        self._loop = asyncio.get_running_loop()
+        key = (id_, star)
+        if not force and icon_res(id_, star).exist:
+            return True
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(self._download(id_, star))
+        return await asyncio.shield(task)
+
+    async def _download(self, id_, star) -> bool:
+        key = (id_, star)
+        url = f'https://redive.estertion.win/icon/unit/{id_}{star}1.webp'
+        res = icon_res(id_, star)
+        logger.info(f'Downloading chara icon from {url}')
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.limit_per_host)
+        try:
+            # 在信号量内发起请求，使ClientTimeout的total不包含在连接池中排队的时间
+            async with self._sem:
+                async with self._get_session().get(url) as rsp:
+                    if rsp.status != 200:
+                        logger.error(f'Failed to download {url}. HTTP {rsp.status}')
+                        self._failed[key] = time.monotonic()
+                        return False
+                    data = await rsp.read()
+            await run_in_pool(_save_icon, data, res.path)
+        except Exception as e:
+            logger.error(f'Failed to download {url}. {type(e)}')
+            logger.exception(e)
+            self._failed[key] = time.monotonic()
+            return False
+        finally:
+            del self._inflight[key]
+        self._failed.pop(key, None)
+        res.register()
+        if self.on_saved:
+            self.on_saved(res.path)
+        logger.info(f'Saved to {res.path}')
+        return True
+
+    def _schedule(self, keys):
+        now = time.monotonic()
+        for key in keys:
+            if key in self._inflight or now - self._failed.get(key, -self.retry_interval) < self.retry_interval:
+                continue
+            self._inflight[key] = asyncio.ensure_future(self._download(*key))
+
+    def fetch_background(self, id_, stars: Iterable[int] = (6, 3, 1)):
+        """在后台下载头像，立即返回"""
+        keys = [(id_, star) for star in stars]
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            if self._loop is None:
+                logger.warning(f'Event loop not bound, cannot fetch icon of chara {id_} in background')
+            else:
+                self._loop.call_soon_threadsafe(self._schedule, keys)
+            return
+        self._schedule(keys)
+
+    async def prefetch(self, ids: Iterable[int], stars: Iterable[int] = (6, 3, 1)) -> Tuple[int, int]:
+        """并发下载`ids`中缺失的头像，返回 (成功数, 失败数)"""
+        results = await asyncio.gather(*(self.fetch(id_, star) for id_ in ids for star in stars
+                                         if not icon_res(id_, star).exist))
+        return sum(results), len(results) - sum(results)
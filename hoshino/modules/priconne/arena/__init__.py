@@ -2,12 +2,13 @@ import re
 import time
 import asyncio
 from collections import defaultdict
+from functools import lru_cache
 from PIL import Image, ImageDraw, ImageFont
 
 import hoshino
 from hoshino import Service, R
 from hoshino.typing import *
-from hoshino.util import FreqLimiter, concat_pic, pic2b64, silence, filt_message
+from hoshino.util import FreqLimiter, concat_pic, pic2uri, render_async, silence, filt_message
 
 from .. import chara
 
@@ -27,13 +28,10 @@ aliases_b = tuple('b' + a for a in aliases) + tuple('B' + a for a in aliases)
 aliases_tw = tuple('台' + a for a in aliases)
 aliases_jp = tuple('日' + a for a in aliases)
 
-try:
-    thumb_up_i = R.img('priconne/gadget/thumb-up-i.png').open().resize((16, 16), Image.LANCZOS)
-    thumb_up_a = R.img('priconne/gadget/thumb-up-a.png').open().resize((16, 16), Image.LANCZOS)
-    thumb_down_i = R.img('priconne/gadget/thumb-down-i.png').open().resize((16, 16), Image.LANCZOS)
-    thumb_down_a = R.img('priconne/gadget/thumb-down-a.png').open().resize((16, 16), Image.LANCZOS)
-except Exception as e:
-    sv.logger.exception(e)
+@lru_cache(maxsize=None)
+def thumb(name) -> Image:
+    """点赞/点踩图标，首次渲染时才读取"""
+    return R.img(f'priconne/gadget/{name}.png').open().resize((16, 16), Image.LANCZOS)
 
 @sv.on_prefix(aliases)
 async def arena_query(bot, ev):
@@ -66,8 +64,8 @@ def render_atk_def_teams(entries, border_pix=5):
             x1 = j * icon_size
             x2 = x1 + icon_size
             im.paste(icon, (x1, y1, x2, y2), icon)
-        thumb_up = thumb_up_a if e['user_like'] > 0 else thumb_up_i
-        thumb_down = thumb_down_a if e['user_like'] < 0 else thumb_down_i
+        thumb_up = thumb('thumb-up-a' if e['user_like'] > 0 else 'thumb-up-i')
+        thumb_down = thumb('thumb-down-a' if e['user_like'] < 0 else 'thumb-down-i')
         x1 = 5 * icon_size + 5
         x2 = x1 + 16
         im.paste(thumb_up, (x1, y1+22, x2, y1+38), thumb_up)
@@ -134,9 +132,7 @@ async def _arena_query(bot, ev: CQEvent, region: int):
 
     # 发送回复
     sv.logger.info('Arena generating picture...')
-    teams = render_atk_def_teams(res)
-    teams = pic2b64(teams)
-    teams = MessageSegment.image(teams)
+    teams = await render_async(render_atk_def_teams, res)
     sv.logger.info('Arena picture ready!')
     # 纯文字版
     # atk_team = '\n'.join(map(lambda entry: ' '.join(map(lambda x: f"{x.name}{x.star if x.star else ''}{'专' if x.equip else ''}" , entry['atk'])) , res))
@@ -203,7 +199,7 @@ async def upload(ss: CommandSession):
     atk_team = ss.get('atk_team', prompt='请输入进攻队+5个表示星级的数字+5个表示专武的0/1 无需空格')
     def_team = ss.get('def_team', prompt='请输入防守队+5个表示星级的数字+5个表示专武的0/1 无需空格')
     if 'pic' not in ss.state:
-        ss.state['pic'] = MessageSegment.image(pic2b64(concat_pic([
+        ss.state['pic'] = MessageSegment.image(pic2uri(concat_pic([
             chara.gen_team_pic(atk_team),
             chara.gen_team_pic(def_team),
         ])))
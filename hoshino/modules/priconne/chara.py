@@ -1,9 +1,12 @@
+import asyncio
 import importlib
-from io import BytesIO
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
 
 import pygtrie
-import requests
-from fuzzywuzzy import fuzz, process
 from PIL import Image
 
 import hoshino
@@ -11,9 +14,14 @@ from hoshino import R, log, sucmd, util
 from hoshino.typing import CommandSession
 
 from . import _pcr_data
+from ._icon_atlas import IconAtlas
+from ._icon_fetcher import IconFetcher, icon_res
 
 logger = log.new_logger('chara', hoshino.config.DEBUG)
 UNKNOWN = 1000
+_icon_cache: "OrderedDict[tuple, tuple]" = OrderedDict()  # {(头像路径, star, equip, size, star_slot_verbose): (头像文件的mtime, 渲染结果)}
+_icon_cache_size = getattr(hoshino.config, 'CHARA_ICON_CACHE_SIZE', 512)
+_icon_lock = threading.Lock()   # 渲染在线程池中进行
 UnavailableChara = {
     1069,   # 霸瞳
     1072,   # 可萝爹
@@ -23,22 +31,36 @@ UnavailableChara = {
     1184,   # 星弓栞
 }
 
-try:
-    gadget_equip = R.img('priconne/gadget/equip.png').open()
-    gadget_star = R.img('priconne/gadget/star.png').open()
-    gadget_star_dis = R.img('priconne/gadget/star_disabled.png').open()
-    gadget_star_pink = R.img('priconne/gadget/star_pink.png').open()
-    unknown_chara_icon = R.img(f'priconne/unit/icon_unit_{UNKNOWN}31.png').open()
-except Exception as e:
-    logger.exception(e)
+
+@lru_cache(maxsize=None)
+def _load_img(path) -> Image:
+    """星级、专武等图片素材，首次使用时才读取"""
+    img = R.img(path).open()
+    img.load()
+    return img
+
+def gadget(name) -> Image:
+    return _load_img(f'priconne/gadget/{name}.png')
+
+@lru_cache(maxsize=None)
+def scaled_gadget(name, size) -> Image:
+    """按尺寸预缩放的星级、专武图标，只读"""
+    return gadget(name).resize((size, size), Image.LANCZOS)
+
+def unknown_chara_icon() -> Image:
+    return _load_img(f'priconne/unit/icon_unit_{UNKNOWN}31.png')
 
 
 class Roster:
 
     def __init__(self):
         self._roster = pygtrie.CharTrie()
-        self.update()
-    
+        self._loaded = False    # 首次查询时才构建花名册
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.update()
+
     def update(self):
         importlib.reload(_pcr_data)
         self._roster.clear()
@@ -50,21 +72,26 @@ class Roster:
                 else:
                     logger.warning(f'priconne.chara.Roster: 出现重名{n}于id{idx}与id{self._roster[n]}')
         self._all_name_list = self._roster.keys()
+        self._loaded = True
 
 
     def get_id(self, name):
+        self._ensure_loaded()
         name = util.normalize_str(name)
         return self._roster[name] if name in self._roster else UNKNOWN
 
 
     def guess_id(self, name):
         """@return: id, name, score"""
+        from fuzzywuzzy import process
+        self._ensure_loaded()
         name, score = process.extractOne(name, self._all_name_list, processor=util.normalize_str)
         return self._roster[name], name, score
 
 
     def parse_team(self, namestr):
         """@return: List[ids], unknown_namestr"""
+        self._ensure_loaded()
         namestr = util.normalize_str(namestr.strip())
         team = []
         unknown = []
@@ -110,21 +137,29 @@ def gen_team_pic(team, size=64, star_slot_verbose=True):
     return des
 
 
-def download_chara_icon(id_, star):
-    url = f'https://redive.estertion.win/icon/unit/{id_}{star}1.webp'
-    save_path = R.img(f'priconne/unit/icon_unit_{id_}{star}1.png').path
-    logger.info(f'Downloading chara icon from {url}')
-    try:
-        rsp = requests.get(url, stream=True, timeout=5)
-    except Exception as e:
-        logger.error(f'Failed to download {url}. {type(e)}')
-        logger.exception(e)
-    if 200 == rsp.status_code:
-        img = Image.open(BytesIO(rsp.content))
-        img.save(save_path)
-        logger.info(f'Saved to {save_path}')
-    else:
-        logger.error(f'Failed to download {url}. HTTP {rsp.status_code}')
+def _drop_icon_cache(path):
+    icon_atlas.discard(os.path.basename(path))
+    with _icon_lock:
+        for key in [k for k in _icon_cache if k[0] == path]:
+            del _icon_cache[key]
+
+
+icon_atlas = IconAtlas()
+try:
+    icon_atlas.load()
+except Exception as e:
+    logger.error(f'Failed to load chara icon atlas, falling back to per-file icons. {type(e)}')
+    logger.exception(e)
+
+
+icon_fetcher = IconFetcher(getattr(hoshino.config, 'ICON_FETCH_CONCURRENCY', 4),
+                           retry_interval=getattr(hoshino.config, 'ICON_RETRY_INTERVAL', 3600),
+                           on_saved=_drop_icon_cache)
+try:
+    hoshino.get_bot().on_startup(icon_fetcher.bind_loop)
+    hoshino.get_bot().server_app.after_serving(icon_fetcher.close)
+except ValueError:
+    pass    # 未初始化bot（如离线运行基准测试）时只能在事件循环中触发下载
 
 
 class Chara:
@@ -144,32 +179,46 @@ class Chara:
 
     @property
     def icon(self):
+        """角色头像，缺失时在后台下载并暂以未知角色的头像代替"""
         star = '3' if 1 <= self.star <= 5 else '6'
-        res = R.img(f'priconne/unit/icon_unit_{self.id}{star}1.png')
-        if not res.exist:
-            res = R.img(f'priconne/unit/icon_unit_{self.id}31.png')
-        if not res.exist:
-            res = R.img(f'priconne/unit/icon_unit_{self.id}11.png')
-        if not res.exist:   # FIXME: 不方便改成异步请求
-            download_chara_icon(self.id, 6)
-            download_chara_icon(self.id, 3)
-            download_chara_icon(self.id, 1)
-            res = R.img(f'priconne/unit/icon_unit_{self.id}{star}1.png')
-        if not res.exist:
-            res = R.img(f'priconne/unit/icon_unit_{self.id}31.png')
-        if not res.exist:
-            res = R.img(f'priconne/unit/icon_unit_{self.id}11.png')
-        if not res.exist:
-            res = R.img(f'priconne/unit/icon_unit_{UNKNOWN}31.png')
-        return res
+        for s in (star, '3', '1'):
+            res = icon_res(self.id, s)
+            if res.exist:
+                return res
+        icon_fetcher.fetch_background(self.id)
+        return icon_res(UNKNOWN, '3')
 
 
     def render_icon(self, size, star_slot_verbose=True) -> Image:
+        """渲染带星级与专武标记的头像，结果按LRU缓存，返回的是缓存的副本"""
+        icon = self.icon
+        key = (icon.path, self.star, self.equip, size, star_slot_verbose)
         try:
-            pic = self.icon.open().convert('RGBA').resize((size, size), Image.LANCZOS)
+            mtime = os.stat(icon.path).st_mtime_ns     # 头像文件被手动替换后不再返回旧的渲染结果
+        except OSError:
+            mtime = None
+        pic = None
+        with _icon_lock:
+            entry = _icon_cache.get(key)
+            if entry is not None and entry[0] == mtime:
+                pic = entry[1]
+                _icon_cache.move_to_end(key)
+        if pic is None:
+            pic = self._render_icon(icon, size, star_slot_verbose)
+            with _icon_lock:
+                _icon_cache[key] = (mtime, pic)
+                while len(_icon_cache) > _icon_cache_size:
+                    _icon_cache.popitem(last=False)
+        return pic.copy()
+
+    def _render_icon(self, icon, size, star_slot_verbose) -> Image:
+        try:
+            pic = icon_atlas.get(os.path.basename(icon.path), size)
+            if pic is None:
+                pic = icon.open().convert('RGBA').resize((size, size), Image.LANCZOS)
         except FileNotFoundError:
-            logger.error(f'File not found: {self.icon.path}')
-            pic = unknown_chara_icon.convert('RGBA').resize((size, size), Image.LANCZOS)
+            logger.error(f'File not found: {icon.path}')
+            pic = unknown_chara_icon().convert('RGBA').resize((size, size), Image.LANCZOS)
 
         l = size // 6
         star_lap = round(l * 0.15)
@@ -179,20 +228,18 @@ class Chara:
             for i in range(5 if star_slot_verbose else min(self.star, 5)):
                 a = i*(l-star_lap) + margin_x
                 b = size - l - margin_y
-                s = gadget_star if self.star > i else gadget_star_dis
-                s = s.resize((l, l), Image.LANCZOS)
+                s = scaled_gadget('star' if self.star > i else 'star_disabled', l)
                 pic.paste(s, (a, b, a+l, b+l), s)
             if 6 == self.star:
                 a = 5*(l-star_lap) + margin_x
                 b = size - l - margin_y
-                s = gadget_star_pink
-                s = s.resize((l, l), Image.LANCZOS)
+                s = scaled_gadget('star_pink', l)
                 pic.paste(s, (a, b, a+l, b+l), s)
         if self.equip:
             l = round(l * 1.5)
             a = margin_x
             b = margin_x
-            s = gadget_equip.resize((l, l), Image.LANCZOS)
+            s = scaled_gadget('equip', l)
             pic.paste(s, (a, b, a+l, b+l), s)
         return pic
 
@@ -213,10 +260,27 @@ async def download_pcr_chara_icon(session: CommandSession):
     try:
         id_ = roster.get_id(session.current_arg_text.strip())
         assert id_ != UNKNOWN, '未知角色名'
-        download_chara_icon(id_, 6)
-        download_chara_icon(id_, 3)
-        download_chara_icon(id_, 1)
-        await session.send('ok')
+        ok = await asyncio.gather(*(icon_fetcher.fetch(id_, star, force=True) for star in (6, 3, 1)))
+        await session.send(f'ok: ★6 {ok[0]}, ★3 {ok[1]}, ★1 {ok[2]}')
     except Exception as e:
         logger.exception(e)
         await session.send(f'Error: {type(e)}')
+
+
+@sucmd('prefetch-pcr-chara-icon', force_private=False, aliases=('预下载角色头像', ))
+async def prefetch_pcr_chara_icon(session: CommandSession):
+    ids = [i for i in _pcr_data.CHARA_NAME if i != UNKNOWN]
+    await session.send(f'开始下载{len(ids)}个角色的缺失头像...')
+    start = time.perf_counter()
+    ok, failed = await icon_fetcher.prefetch(ids)
+    await session.send(f'下载完成：成功{ok}个，失败或不存在{failed}个，耗时{time.perf_counter() - start:.1f}s')
+
+
+@sucmd('rebuild-pcr-icon-atlas', force_private=False, aliases=('重建头像图集', ))
+async def rebuild_pcr_icon_atlas(session: CommandSession):
+    sizes = getattr(hoshino.config, 'ICON_ATLAS_SIZES', [64])
+    start = time.perf_counter()
+    n = await util.run_in_pool(icon_atlas.build, sizes)
+    with _icon_lock:
+        _icon_cache.clear()
+    await session.send(f'头像图集已重建：{n}个头像，尺寸{sizes}，耗时{time.perf_counter() - start:.1f}s')
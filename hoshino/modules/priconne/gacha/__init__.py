@@ -4,7 +4,7 @@ from collections import defaultdict
 
 from hoshino import Service, priv, util
 from hoshino.typing import *
-from hoshino.util import DailyNumberLimiter, concat_pic, pic2b64, silence
+from hoshino.util import DailyNumberLimiter, concat_pic, render_async, silence
 
 from .. import chara
 from .gacha import Gacha
@@ -114,6 +114,10 @@ async def gacha_1(bot, ev: CQEvent):
     await bot.send(ev, f'素敵な仲間が増えますよ！\n{res}', at_sender=True)
 
 
+def render_gacha_pic(rows):
+    return concat_pic([chara.gen_team_pic(row, star_slot_verbose=False) for row in rows])
+
+
 @sv.on_prefix(gacha_10_aliases, only_to_me=True)
 async def gacha_10(bot, ev: CQEvent):
     SUPER_LUCKY_LINE = 170
@@ -126,11 +130,7 @@ async def gacha_10(bot, ev: CQEvent):
     result, hiishi = gacha.gacha_ten()
     silence_time = hiishi * 6 if hiishi < SUPER_LUCKY_LINE else hiishi * 60
 
-    res1 = chara.gen_team_pic(result[:5], star_slot_verbose=False)
-    res2 = chara.gen_team_pic(result[5:], star_slot_verbose=False)
-    res = concat_pic([res1, res2])
-    res = pic2b64(res)
-    res = MessageSegment.image(res)
+    res = await render_async(render_gacha_pic, [result[:5], result[5:]])
     result = [f'{c.name}{"★"*c.star}' for c in result]
     res1 = ' '.join(result[0:5])
     res2 = ' '.join(result[5:])
@@ -168,13 +168,7 @@ async def gacha_tenjou(bot, ev: CQEvent):
         res = "竟...竟然没有3★？！"
     else:
         step = 4
-        pics = []
-        for i in range(0, lenth, step):
-            j = min(lenth, i + step)
-            pics.append(chara.gen_team_pic(res[i:j], star_slot_verbose=False))
-        res = concat_pic(pics)
-        res = pic2b64(res)
-        res = MessageSegment.image(res)
+        res = await render_async(render_gacha_pic, [res[i:i+step] for i in range(0, lenth, step)])
 
     msg = [
         f"\n素敵な仲間が増えますよ！ {res}",
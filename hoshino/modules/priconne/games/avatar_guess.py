@@ -24,6 +24,7 @@ gm = GameMaster(DB_PATH)
 sv = Service(
     "pcr-avatar-guess",
     bundle="pcr娱乐",
+    ordered=False,
     help_="""
 [猜头像] 猜猜bot随机发送的头像的一小部分来自哪位角色
 [猜头像排行] 显示小游戏的群排行榜(只显示前十)
@@ -60,7 +61,7 @@ async def avatar_guess(bot, ev: CQEvent):
         l = random.randint(0, w - PATCH_SIZE)
         u = random.randint(0, h - PATCH_SIZE)
         cropped = img.crop((l, u, l + PATCH_SIZE, u + PATCH_SIZE))
-        cropped = Seg.image(util.pic2b64(cropped))
+        cropped = Seg.image(util.pic2uri(cropped))
         await bot.send(ev, f"猜猜这个图片是哪位角色头像的一部分?({ONE_TURN_TIME}s后公布答案) {cropped}")
         await asyncio.sleep(ONE_TURN_TIME)
         if game.winner:
@@ -1,4 +1,3 @@
-import os
 import random
 
 from nonebot.exceptions import CQHttpError
@@ -12,15 +11,14 @@ _nlmt = DailyNumberLimiter(_max)
 _flmt = FreqLimiter(5)
 
 sv = Service('setu', manage_priv=priv.SUPERUSER, enable_on_default=True, visible=False)
-setu_folder = R.img('setu/').path
+setu_folder = R.img('setu/')
 
 def setu_gener():
     while True:
-        filelist = os.listdir(setu_folder)
+        filelist = setu_folder.files
         random.shuffle(filelist)
         for filename in filelist:
-            if os.path.isfile(os.path.join(setu_folder, filename)):
-                yield R.img('setu/', filename)
+            yield R.img('setu/', filename)
 
 setu_gener = setu_gener()
 
@@ -1,4 +1,6 @@
-from hoshino import CanceledException, message_preprocessor, trigger
+from hoshino import CanceledException, Service, message_preprocessor, metrics, priv, trigger
+from hoshino.dedup import dedup
+from hoshino.executor import executor
 from hoshino.typing import CQEvent
 
 
@@ -8,28 +10,40 @@ async def handle_message(bot, event: CQEvent, _):
     if event.detail_type != 'group':
         return
 
-    service_funcs = []
-    for t in trigger.chain:
-        service_funcs.extend(t.find_handler(event))
+    if not dedup.should_handle(event):
+        raise CanceledException('Duplicated event received by another bot account')
 
-    if not service_funcs:
-        return  # triggered nothing.
+    enabled = Service.get_group_enabled_services(event.group_id)
+    user_priv = None
+    for service_func in trigger.find_handlers(event):
 
-    for service_func in service_funcs:
+        if service_func.sv not in enabled:
+            continue
+
+        if user_priv is None:   # triggered something.
+            if priv.check_block_group(event.group_id):
+                return  # group blocked.
+            user_priv = priv.get_user_priv(event)
 
         if service_func.only_to_me and not event['to_me']:
             continue  # not to me, ignore.
 
-        if not service_func.sv._check_all(event):
+        if user_priv < service_func.sv.use_priv:
             continue  # permission denied.
 
         service_func.sv.logger.info(f'Message {event.message_id} triggered {service_func.__name__}.')
-        try:
-            await service_func.func(bot, event)
-        except CanceledException:
-            raise
-        except Exception as e:
-            service_func.sv.logger.error(f'{type(e)} occured when {service_func.__name__} handling message {event.message_id}.')
-            service_func.sv.logger.exception(e)
+        key = (event.group_id, service_func.sv.name) if service_func.sv.ordered else None
+        executor.submit(key, _run_service_func, bot, event, service_func)
         raise CanceledException('Handled by Hoshino')
         # exception raised, no need for break
+
+
+async def _run_service_func(bot, event: CQEvent, service_func):
+    try:
+        with metrics.timer('message', service_func.sv.name, service_func.__name__):
+            await service_func.func(bot, event)
+    except CanceledException:
+        pass    # finished by bot.finish
+    except Exception as e:
+        service_func.sv.logger.error(f'{type(e)} occured when {service_func.__name__} handling message {event.message_id}.')
+        service_func.sv.logger.exception(e)
@@ -53,6 +53,13 @@ def check_block_user(user_id):
 
 
 def get_user_priv(ev: CQEvent):
+    """获取用户权限，结果缓存于事件中，同一事件只解析一次"""
+    if '_user_priv' not in ev:
+        ev['_user_priv'] = _resolve_user_priv(ev)
+    return ev['_user_priv']
+
+
+def _resolve_user_priv(ev: CQEvent):
     uid = ev.user_id
     if uid in hoshino.config.SUPERUSERS:
         return SUPERUSER
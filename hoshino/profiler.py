@@ -0,0 +1,125 @@
+"""低开销的采样分析器
+
+后台线程按固定间隔读取事件循环线程的调用栈，不需要插桩，对运行中的bot影响很小。
+属于某个服务模块的栈帧前会插入`[服务名]`，便于在火焰图中按服务归类。
+结果以collapsed stack格式保存，可直接交给flamegraph.pl或speedscope等工具。
+事件循环在selector中等待IO的样本视为空闲，仍保存在结果文件中，但不计入`top`，由`idle`单独统计。
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+_profile_dir = os.path.expanduser('~/.hoshino/profiles/')
+_IDLE_LEAVES = frozenset((
+    'selectors:select',                 # SelectorEventLoop
+    'asyncio.windows_events:_poll',     # ProactorEventLoop
+))
+
+
+class SamplingProfiler:
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._labels = {}   # {code: (label, service_name)}
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._target = None
+        self._start_time = 0.0
+        self.run_id = 0     # 每次start递增，用于判断某次采样是否仍在进行
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, thread_id: int = None) -> int:
+        """开始采样`thread_id`线程，缺省为调用者所在线程（通常即事件循环线程），返回本次采样的run_id"""
+        if self.running:
+            raise RuntimeError('Profiler is already running')
+        self.stacks.clear()
+        self.samples = 0
+        self._target = thread_id or threading.get_ident()
+        self._stop.clear()
+        self._start_time = time.monotonic()
+        self._thread = threading.Thread(target=self._sample, name='hoshino-profiler', daemon=True)
+        self._thread.start()
+        self.run_id += 1
+        return self.run_id
+
+    def stop(self) -> float:
+        """停止采样，返回采样时长"""
+        if not self.running:
+            raise RuntimeError('Profiler is not running')
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        return time.monotonic() - self._start_time
+
+    def _label(self, frame) -> Tuple[str, Optional[str]]:
+        code = frame.f_code
+        label = self._labels.get(code)
+        if label is None:
+            from hoshino.service import Service
+            module = frame.f_globals.get('__name__', '?')
+            sv = frame.f_globals.get('sv')
+            sv_name = sv.name if module.startswith('hoshino.modules.') and isinstance(sv, Service) else None
+            label = self._labels[code] = (f'{module}:{code.co_name}', sv_name)
+        return label
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(self._label(frame))
+                frame = frame.f_back
+            stack = []
+            current_sv = None
+            for label, sv_name in reversed(labels):
+                if sv_name and sv_name != current_sv:
+                    stack.append(f'[{sv_name}]')
+                    current_sv = sv_name
+                stack.append(label)
+            self.stacks[';'.join(stack)] += 1
+            self.samples += 1
+
+    def dump(self) -> str:
+        """将采样结果写入`~/.hoshino/profiles/`，返回文件路径"""
+        os.makedirs(_profile_dir, exist_ok=True)
+        filename = os.path.join(_profile_dir, datetime.now().strftime('profile-%Y%m%d-%H%M%S.folded'))
+        with open(filename, 'w', encoding='utf8') as f:
+            for stack, n in self.stacks.most_common():
+                f.write(f'{stack} {n}\n')
+        return filename
+
+    @staticmethod
+    def _is_idle(stack: str) -> bool:
+        return stack.rpartition(';')[2] in _IDLE_LEAVES
+
+    @property
+    def idle(self) -> int:
+        """事件循环空闲等待的样本数"""
+        return sum(cnt for stack, cnt in self.stacks.items() if self._is_idle(stack))
+
+    def top(self, n: int = 10) -> List[Tuple[str, int, int]]:
+        """返回最热的n个栈帧 (label, self_samples, total_samples)，不含空闲等待的样本"""
+        self_cnt, total_cnt = Counter(), Counter()
+        for stack, cnt in self.stacks.items():
+            if self._is_idle(stack):
+                continue
+            frames = stack.split(';')
+            self_cnt[frames[-1]] += cnt
+            for f in set(frames):
+                total_cnt[f] += cnt
+        return [(f, c, total_cnt[f]) for f, c in self_cnt.most_common(n)]
+
+
+profiler = SamplingProfiler()
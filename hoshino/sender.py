@@ -0,0 +1,111 @@
+"""发送账号的选择策略
+
+记录各bot账号近期（`SENDER_WINDOW`秒内）的发送量与失败情况，
+为推送等不限定发送账号的场景选出负载最低的健康账号。
+连续失败`SENDER_MAX_FAILURES`次的账号视为不健康，`SENDER_COOLDOWN`秒内不再优先选用。
+
+发送记录由`install`包装bot的`call_action`与`send`自动采集：
+推送等指定了self_id的发送按该账号记录；回复消息（`bot.send`、`session.send`）不带self_id，
+仍由收到消息的账号发出，按事件的self_id计入该账号的负载。
+账号连接以字符串形式的self_id登记，记录时统一转为int。
+"""
+
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, Iterable, Mapping
+
+from aiocqhttp import ActionFailed, NetworkError
+
+import hoshino
+
+_SEND_ACTIONS = frozenset(('send_msg', 'send_group_msg', 'send_private_msg', 'send_group_forward_msg'))
+
+
+class SenderSelector:
+
+    def __init__(self, window: float = 60, max_failures: int = 3, cooldown: float = 300):
+        self.window = window
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self._sent: Dict[int, Deque[float]] = defaultdict(deque)   # {self_id: 近期发送时间}
+        self._failures: Dict[int, int] = defaultdict(int)          # {self_id: 连续失败次数}
+        self._last_failure: Dict[int, float] = {}
+
+    def _trim(self, sent: Deque[float], now):
+        while sent and sent[0] < now - self.window:
+            sent.popleft()
+
+    def _recent(self, self_id, now) -> int:
+        sent = self._sent[int(self_id)]
+        self._trim(sent, now)
+        return len(sent)
+
+    def record(self, self_id, ok: bool):
+        now = time.monotonic()
+        self_id = int(self_id)
+        sent = self._sent[self_id]
+        sent.append(now)
+        self._trim(sent, now)   # 只回复、从不推送的账号也不会无限积累记录
+        if ok:
+            self._failures[self_id] = 0
+        else:
+            self._failures[self_id] += 1
+            self._last_failure[self_id] = now
+
+    def healthy(self, self_id) -> bool:
+        self_id = int(self_id)
+        return (self._failures[self_id] < self.max_failures
+                or time.monotonic() - self._last_failure[self_id] > self.cooldown)
+
+    def choose(self, selfids: Iterable[int], pending: Mapping[int, int] = None) -> int:
+        """从`selfids`中选出健康且负载最低的账号
+
+        `pending`为调用方已分派、尚未发出的消息数，计入负载
+        """
+        now = time.monotonic()
+        pending = pending or {}
+        return min(selfids, key=lambda sid: (not self.healthy(sid),
+                                             self._recent(sid, now) + pending.get(sid, 0),
+                                             self._failures[int(sid)]))
+
+    def stats(self) -> Dict[int, dict]:
+        now = time.monotonic()
+        return {
+            sid: {'recent': self._recent(sid, now), 'failures': self._failures[sid], 'healthy': self.healthy(sid)}
+            for sid in list(self._sent)
+        }
+
+
+selector = SenderSelector(getattr(hoshino.config, 'SENDER_WINDOW', 60),
+                          getattr(hoshino.config, 'SENDER_MAX_FAILURES', 3),
+                          getattr(hoshino.config, 'SENDER_COOLDOWN', 300))
+
+
+async def _recorded(self_id, coro):
+    try:
+        ret = await coro
+    except (ActionFailed, NetworkError):
+        selector.record(self_id, False)
+        raise
+    selector.record(self_id, True)
+    return ret
+
+
+def install(bot):
+    """包装`bot.call_action`与`bot.send`，记录每次发送消息的结果"""
+    call_action = bot.call_action
+    send = bot.send
+
+    async def call_action_wrapper(action, **params):
+        self_id = params.get('self_id')
+        if action not in _SEND_ACTIONS or self_id is None:
+            return await call_action(action, **params)
+        return await _recorded(self_id, call_action(action, **params))
+
+    async def send_wrapper(event, message, **kwargs):
+        if 'self_id' in kwargs or event.self_id is None:     # 前者由call_action记录
+            return await send(event, message, **kwargs)
+        return await _recorded(event.self_id, send(event, message, **kwargs))
+
+    bot.call_action = call_action_wrapper
+    bot.send = send_wrapper
@@ -1,7 +1,5 @@
-import asyncio
-import os
-import random
 import re
+import time
 from collections import defaultdict
 from functools import wraps
 
@@ -11,51 +9,34 @@ from nonebot.command import SwitchException, _FinishException, _PauseException
 from nonebot.message import CanceledException
 
 import hoshino
-from hoshino import log, priv, trigger
+from hoshino import broadcast, grouplist, log, metrics, priv, svconfig, trigger
+from hoshino.dedup import dedup
+from hoshino.executor import executor
 from hoshino.typing import *
 
-try:
-    import ujson as json
-except:
-    import json
-
 # service management
 _loaded_services: Dict[str, "Service"] = {}  # {name: service}
 _service_bundle: Dict[str, List["Service"]] = defaultdict(list)
+_group_enabled_services: Dict[int, FrozenSet["Service"]] = {}  # {group_id: 该群启用的服务}，按需建立
 _re_illegal_char = re.compile(r'[\\/:*?"<>|\.]')
-_service_config_dir = os.path.expanduser('~/.hoshino/service_config/')
-os.makedirs(_service_config_dir, exist_ok=True)
 
 
 def _load_service_config(service_name):
-    config_file = os.path.join(_service_config_dir, f'{service_name}.json')
-    if not os.path.exists(config_file):
-        return {}  # config file not found, return default config.
-    try:
-        with open(config_file, encoding='utf8') as f:
-            config = json.load(f)
-            return config
-    except Exception as e:
-        hoshino.logger.exception(e)
-        return {}
+    return svconfig.store.get(service_name)
 
 
 def _save_service_config(service):
-    config_file = os.path.join(_service_config_dir, f'{service.name}.json')
-    with open(config_file, 'w', encoding='utf8') as f:
-        json.dump(
-            {
-                "name": service.name,
-                "use_priv": service.use_priv,
-                "manage_priv": service.manage_priv,
-                "enable_on_default": service.enable_on_default,
-                "visible": service.visible,
-                "enable_group": list(service.enable_group),
-                "disable_group": list(service.disable_group)
-            },
-            f,
-            ensure_ascii=False,
-            indent=2)
+    svconfig.store.set(
+        service.name,
+        {
+            "name": service.name,
+            "use_priv": service.use_priv,
+            "manage_priv": service.manage_priv,
+            "enable_on_default": service.enable_on_default,
+            "visible": service.visible,
+            "enable_group": list(service.enable_group),
+            "disable_group": list(service.disable_group)
+        })
 
 
 class ServiceFunc:
@@ -82,7 +63,7 @@ class Service:
     提供接口：
     `scheduled_job`, `broadcast`
 
-    服务的配置文件格式为：
+    服务的配置格式为：
     {
         "name": "ServiceName",
         "use_priv": priv.NORMAL,
@@ -93,14 +74,15 @@ class Service:
         "disable_group": []
     }
 
-    储存位置：
-    `~/.hoshino/service_config/{ServiceName}.json`
+    全部服务的配置合并储存于：
+    `~/.hoshino/service_config.json`，修改经短暂延迟后批量写回，详见`hoshino.svconfig`
     """
     def __init__(self, name, use_priv=None, manage_priv=None, enable_on_default=None, visible=None,
-                 help_=None, bundle=None):
+                 help_=None, bundle=None, ordered=True):
         """
         定义一个服务
         配置的优先级别：配置文件 > 程序指定 > 缺省值
+        `ordered`为False时，消息不在群内排队，见`hoshino.executor`
         """
         assert not _re_illegal_char.search(name), r'Service name cannot contain character in `\/:*?"<>|.`'
 
@@ -120,6 +102,7 @@ class Service:
         if self.visible is None:
             self.visible = True
         self.help = help_
+        self.ordered = ordered
         self.enable_group = set(config.get('enable_group', []))
         self.disable_group = set(config.get('disable_group', []))
 
@@ -128,6 +111,7 @@ class Service:
         assert self.name not in _loaded_services, f'Service name "{self.name}" already exist!'
         _loaded_services[self.name] = self
         _service_bundle[bundle or "通用"].append(self)
+        _group_enabled_services.clear()
 
     @property
     def bot(self):
@@ -141,15 +125,26 @@ class Service:
     def get_bundles():
         return _service_bundle
 
+    @staticmethod
+    def get_group_enabled_services(group_id) -> FrozenSet["Service"]:
+        """获取群内启用的全部服务，结果缓存至该群的服务开关变化为止"""
+        svs = _group_enabled_services.get(group_id)
+        if svs is None:
+            svs = frozenset(sv for sv in _loaded_services.values() if sv.check_enabled(group_id))
+            _group_enabled_services[group_id] = svs
+        return svs
+
     def set_enable(self, group_id):
         self.enable_group.add(group_id)
         self.disable_group.discard(group_id)
+        _group_enabled_services.pop(group_id, None)
         _save_service_config(self)
         self.logger.info(f'Service {self.name} is enabled at group {group_id}')
 
     def set_disable(self, group_id):
         self.enable_group.discard(group_id)
         self.disable_group.add(group_id)
+        _group_enabled_services.pop(group_id, None)
         _save_service_config(self)
         self.logger.info(
             f'Service {self.name} is disabled at group {group_id}')
@@ -169,11 +164,7 @@ class Service:
         """
         gl = defaultdict(list)
         for sid in hoshino.get_self_ids():
-            try:
-                sgl = await self.bot.get_group_list(self_id=sid)
-            except CQHttpError:
-                sgl = []
-            sgl = set(g['group_id'] for g in sgl)
+            sgl = await grouplist.group_list.get(sid)
             if self.enable_on_default:
                 sgl = sgl - self.disable_group
             else:
@@ -185,15 +176,20 @@ class Service:
 
     def on_message(self, event='group') -> Callable:
         def deco(func) -> Callable:
+            async def run(ctx):
+                try:
+                    return await func(self.bot, ctx)
+                except Exception as e:
+                    self.logger.error(f'{type(e)} occured when {func.__name__} handling message {ctx["message_id"]}.')
+                    self.logger.exception(e)
+
             @wraps(func)
             async def wrapper(ctx):
-                if self._check_all(ctx):
-                    try:
-                        return await func(self.bot, ctx)
-                    except Exception as e:
-                        self.logger.error(f'{type(e)} occured when {func.__name__} handling message {ctx["message_id"]}.')
-                        self.logger.exception(e)
-                    return
+                if dedup.should_handle(ctx) and self._check_all(ctx):
+                    if ctx.detail_type == 'group':  # 与触发器的handler一同在群内按服务排队，见`hoshino.executor`
+                        executor.submit((ctx.group_id, self.name) if self.ordered else None, run, ctx)
+                    else:
+                        await run(ctx)
             return self.bot.on_message(event)(wrapper)
         return deco
 
@@ -299,7 +295,8 @@ class Service:
                     return
                 if self._check_all(session.ctx):
                     try:
-                        ret = await func(session)
+                        with metrics.timer('command', self.name, func.__name__):
+                            ret = await func(session)
                         self.logger.info(
                             f'Message {session.ctx["message_id"]} is handled as command by {func.__name__}.'
                         )
@@ -346,7 +343,8 @@ class Service:
             async def wrapper():
                 try:
                     self.logger.info(f'Scheduled job {func.__name__} start.')
-                    ret = await func()
+                    with metrics.timer('scheduled_job', self.name, func.__name__):
+                        ret = await func()
                     self.logger.info(f'Scheduled job {func.__name__} completed.')
                     return ret
                 except Exception as e:
@@ -356,23 +354,16 @@ class Service:
         return deco
 
 
-    async def broadcast(self, msgs, TAG='', interval_time=0.5, randomiser=None):
-        bot = self.bot
-        if isinstance(msgs, (str, MessageSegment, Message)):
-            msgs = (msgs, )
+    async def broadcast(self, msgs, TAG='', interval_time=0.5, randomiser=None) -> "broadcast.BroadcastReport":
+        """向所有启用本服务的群推送消息，返回投递报告
+
+        各群并发推送，发送频率由各bot账号共享的令牌桶限制，详见`hoshino.broadcast`
+        """
+        start = time.perf_counter()
         groups = await self.get_enable_groups()
-        for gid, selfids in groups.items():
-            try:
-                for msg in msgs:
-                    await asyncio.sleep(interval_time)
-                    msg = randomiser(msg) if randomiser else msg
-                    await bot.send_group_msg(self_id=random.choice(selfids), group_id=gid, message=msg)
-                l = len(msgs)
-                if l:
-                    self.logger.info(f"群{gid} 投递{TAG}成功 共{l}条消息")
-            except Exception as e:
-                self.logger.error(f"群{gid} 投递{TAG}失败：{type(e)}")
-                self.logger.exception(e)
+        report = await broadcast.broadcast(groups, msgs, TAG, interval_time, randomiser, self.logger)
+        metrics.observe('broadcast', self.name, TAG or 'broadcast', time.perf_counter() - start, bool(report.failed))
+        return report
 
 
     def on_request(self, *events):
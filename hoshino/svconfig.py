@@ -0,0 +1,117 @@
+"""服务配置的持久化
+
+全部服务的配置合并保存于`~/.hoshino/service_config.json`。
+修改只更新内存，自首个未保存的修改起`SERVICE_CONFIG_FLUSH_DELAY`秒后一次性写回
+（先写临时文件再原子替换），连续开关多个服务或多个群只产生一次写入；退出时写回剩余修改。
+
+合并文件不存在时，自动导入旧版的`~/.hoshino/service_config/{ServiceName}.json`，
+旧文件保留不动。合并文件损坏时，将其改名为`service_config.json.corrupt-{时间戳}`留待人工处理，
+同样改由旧版文件导入，不会以仅含部分服务的配置覆盖它。
+"""
+
+import asyncio
+import atexit
+import os
+import time
+from glob import glob
+from typing import Dict, Optional
+
+import hoshino
+
+try:
+    import ujson as json
+except:
+    import json
+
+
+class ServiceConfigStore:
+
+    def __init__(self, path: str, legacy_dir: str = None, delay: float = 1.0):
+        self.path = path
+        self.legacy_dir = legacy_dir
+        self.delay = delay
+        self.flushes = 0
+        self._data: Optional[Dict[str, dict]] = None
+        self._dirty = False
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._readonly = False  # 损坏的合并文件无法移走时，不再写回以免覆盖
+
+    def _load(self) -> Dict[str, dict]:
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding='utf8') as f:
+                    return json.load(f)
+            except Exception as e:
+                hoshino.logger.exception(e)
+                self._set_aside()
+        data = {}
+        if self.legacy_dir:
+            for config_file in glob(os.path.join(self.legacy_dir, '*.json')):
+                name = os.path.splitext(os.path.basename(config_file))[0]
+                try:
+                    with open(config_file, encoding='utf8') as f:
+                        data[name] = json.load(f)
+                except Exception as e:
+                    hoshino.logger.exception(e)
+            if data:
+                hoshino.logger.info(f'Migrating {len(data)} service configs from {self.legacy_dir} to {self.path}')
+                self._dirty = True
+        return data
+
+    def _set_aside(self):
+        corrupt_file = f'{self.path}.corrupt-{int(time.time())}'
+        try:
+            os.replace(self.path, corrupt_file)
+            hoshino.logger.error(f'Service config {self.path} is corrupt, moved to {corrupt_file}')
+        except OSError as e:
+            hoshino.logger.exception(e)
+            hoshino.logger.error(f'Service config {self.path} is corrupt, changes will not be saved')
+            self._readonly = True
+
+    @property
+    def data(self) -> Dict[str, dict]:
+        if self._data is None:
+            self._data = self._load()
+        return self._data
+
+    def get(self, name) -> dict:
+        return self.data.get(name, {})
+
+    def set(self, name, config: dict):
+        self.data[name] = config
+        self._dirty = True
+        self._schedule()
+
+    def _schedule(self):
+        if self._handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()    # 不在事件循环中（如启动阶段或脚本），直接写入
+            return
+        self._handle = loop.call_later(self.delay, self.flush)
+
+    def flush(self):
+        """立即写回未保存的修改"""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if not self._dirty or self._readonly:
+            return
+        tmp_file = f'{self.path}.tmp'
+        try:
+            with open(tmp_file, 'w', encoding='utf8') as f:
+                json.dump(self._data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.path)
+        except OSError as e:
+            hoshino.logger.exception(e)
+            return
+        self._dirty = False
+        self.flushes += 1
+
+
+store = ServiceConfigStore(os.path.expanduser('~/.hoshino/service_config.json'),
+                           os.path.expanduser('~/.hoshino/service_config/'),
+                           getattr(hoshino.config, 'SERVICE_CONFIG_FLUSH_DELAY', 1.0))
+atexit.register(store.flush)
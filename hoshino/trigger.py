@@ -1,11 +1,14 @@
 import re
-from collections import defaultdict
+from collections import Counter, defaultdict
+from typing import Iterator
 
 import pygtrie
 import zhconv
 
 import hoshino
 from hoshino import util
+from hoshino.util import rexfilter
+from hoshino.util.ahocorasick import Automaton
 from hoshino.typing import CQEvent, List
 
 
@@ -94,6 +97,9 @@ class KeywordTrigger(BaseTrigger):
     def __init__(self):
         super().__init__()
         self.allkw = {}
+        self.order = {}     # 关键词的注册顺序，保证命中的handler顺序与注册顺序一致
+        self.norm_ac = Automaton()  # 匹配规范化文本的关键词
+        self.raw_ac = Automaton()   # 匹配原始文本的关键词
 
     def add(self, keyword: str, sf: "ServiceFunc"):
         if sf.normalize_text:
@@ -103,14 +109,19 @@ class KeywordTrigger(BaseTrigger):
             hoshino.logger.warning(f"Keyword trigger `{keyword}` added multi handler: `{sf.__name__}`")
         else:
             self.allkw[keyword] = [sf]
+            self.order[keyword] = len(self.order)
             hoshino.logger.debug(f"Succeed to add keyword trigger `{keyword}`")
+        ac = self.norm_ac if sf.normalize_text else self.raw_ac
+        if keyword not in ac:
+            ac.add(keyword)
 
     def find_handler(self, event: CQEvent) -> List["ServiceFunc"]:
+        norm_hit = self.norm_ac.values(event.norm_text) if self.norm_ac else set()
+        raw_hit = self.raw_ac.values(event.plain_text) if self.raw_ac else set()
         ret = []
-        for kw, sfs in self.allkw.items():
-            for sf in sfs:
-                text = event.norm_text if sf.normalize_text else event.plain_text
-                if kw in text:
+        for kw in sorted(norm_hit | raw_hit, key=self.order.__getitem__):
+            for sf in self.allkw[kw]:
+                if kw in (norm_hit if sf.normalize_text else raw_hit):
                     ret.append(sf)
         return ret
 
@@ -119,16 +130,38 @@ class RexTrigger(BaseTrigger):
     def __init__(self):
         super().__init__()
         self.allrex = defaultdict(list)
+        self.required = {}  # {rex: 必需字面量}，见`util.rexfilter`
+        self.relaxed = {}   # {rex: 放宽至原文的必需字符}，用于在规范化前预筛选
 
     def add(self, rex: re.Pattern, sf: "ServiceFunc"):
+        if rex not in self.required:
+            self.required[rex] = rexfilter.required_literals(rex)
         self.allrex[rex].append(sf)
         hoshino.logger.debug(f"Succeed to add rex trigger `{rex.pattern}`")
 
+    def _may_match_raw(self, rex, required, plain_text) -> bool:
+        """以原文预筛选匹配规范化文本的正则，无需先规范化"""
+        relaxed = self.relaxed.get(rex)
+        if relaxed is None:
+            preimages = util.normalize_preimages()
+            relaxed = self.relaxed[rex] = rexfilter.relax(required, preimages) if preimages is not None else []
+        if not relaxed or (not plain_text.isascii() and max(plain_text) > '\uffff'):
+            return True     # 逆映射只覆盖BMP
+        return rexfilter.may_match(relaxed, plain_text)
+
     def find_handler(self, event: CQEvent) -> "ServiceFunc":
         ret = []
         for rex, sfs in self.allrex.items():
+            required = self.required[rex]
             for sf in sfs:
-                text = event.norm_text if sf.normalize_text else event.plain_text
+                if not sf.normalize_text:
+                    text = event.plain_text
+                elif required and not self._may_match_raw(rex, required, event.plain_text):
+                    continue
+                else:
+                    text = event.norm_text
+                if required and not rexfilter.may_match(required, text):
+                    continue
                 match = rex.search(text)
                 if match:
                     event["match"] = match
@@ -136,15 +169,34 @@ class RexTrigger(BaseTrigger):
         return ret
 
 
-class _PlainTextExtractor(BaseTrigger):
-    def find_handler(self, event: CQEvent):
-        event.plain_text = event.message.extract_plain_text().strip()
-        return []
+text_stats = Counter()   # 统计纯文本提取与规范化的实际执行次数
+
+
+class _LazyTextEvent(CQEvent):
+    """`plain_text`与`norm_text`在首次读取时才计算并缓存的CQEvent"""
+
+    def __getattr__(self, key):
+        if key in self:
+            return self[key]
+        if key == 'plain_text':
+            text_stats['plain_text'] += 1
+            self['plain_text'] = self.message.extract_plain_text().strip()
+            return self['plain_text']
+        if key == 'norm_text':
+            plain_text = self.plain_text
+            if plain_text:     # 纯图片等消息无需规范化
+                text_stats['norm_text'] += 1
+                plain_text = util.normalize_str(plain_text)
+            self['norm_text'] = plain_text
+            return self['norm_text']
+        return None
+
 
-class _TextNormalizer(_PlainTextExtractor):
+class _LazyTextNormalizer(BaseTrigger):
     def find_handler(self, event: CQEvent):
-        super().find_handler(event)
-        event.norm_text = util.normalize_str(event.plain_text)
+        text_stats['event'] += 1
+        # `Event.__setattr__`会写入dict的键，须绕过它才能替换类
+        object.__setattr__(event, '__class__', _LazyTextEvent)
         return []
 
 
@@ -154,9 +206,25 @@ keyword = KeywordTrigger()
 rex = RexTrigger()
 
 chain: List[BaseTrigger] = [
+    _LazyTextNormalizer(),
     prefix,
     suffix,
-    _TextNormalizer(),
     rex,
     keyword,
 ]
+_EAGER = 3  # chain中总是执行的部分
+
+
+def find_handlers(event: CQEvent) -> Iterator["ServiceFunc"]:
+    """按chain的顺序逐个产出匹配的handler
+
+    前缀与后缀触发器会剥离消息中匹配到的前后缀，二者总是都执行，
+    因此`plain_text`与handler看到的消息同原先逐个执行整条chain时一致（均为剥离后的）。
+    rex与keyword仅在调用方未停止迭代（前面的handler均不可执行）时才执行，
+    `norm_text`随之按需计算。
+    """
+    found = [t.find_handler(event) for t in chain[:_EAGER]]
+    for sfs in found:
+        yield from sfs
+    for t in chain[_EAGER:]:
+        yield from t.find_handler(event)
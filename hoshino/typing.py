@@ -1,5 +1,5 @@
-from typing import (Any, Callable, Dict, Iterable, List, NamedTuple, Optional,
-                    Set, Tuple, Union)
+from typing import (Any, Callable, Dict, FrozenSet, Iterable, List, NamedTuple,
+                    Optional, Set, Tuple, Union)
 
 from aiocqhttp import Event as CQEvent
 from nonebot import (CommandSession, CQHttpError, Message, MessageSegment,
@@ -1,21 +1,23 @@
 import base64
 import os
+import re
 import time
 import unicodedata
 from collections import defaultdict
 from datetime import datetime, timedelta
-from io import BytesIO
+from functools import lru_cache
 
 import pytz
 import zhconv
 from aiocqhttp.exceptions import ActionFailed
 from aiocqhttp.message import escape
-from matplotlib import pyplot as plt
 from PIL import Image
 
 import hoshino
 from hoshino.typing import CQEvent, Message, Union
 
+from . import imgcodec, imgstore
+
 try:
     import ujson as json
 except:
@@ -73,18 +75,26 @@ async def silence(ev: CQEvent, ban_time, skip_su=True):
         hoshino.logger.exception(e)
 
 
-def pic2b64(pic: Image) -> str:
-    buf = BytesIO()
-    pic.save(buf, format='PNG')
-    base64_str = base64.b64encode(buf.getvalue()).decode()
-    return 'base64://' + base64_str
+def pic2b64(pic: Image, **options) -> str:
+    """编码参数见`imgcodec.EncodeOptions`，缺省值取自配置"""
+    data = imgcodec.encode(pic, imgcodec.default_options(**options))
+    return 'base64://' + base64.b64encode(data).decode()
+
+
+def fig2b64(plt, dpi=None, **options) -> str:
+    options.setdefault('quantize', getattr(hoshino.config, 'FIGURE_QUANTIZE', False))
+    data = imgcodec.encode_figure(plt, imgcodec.default_options(**options), dpi)
+    return 'base64://' + base64.b64encode(data).decode()
 
 
-def fig2b64(plt: plt) -> str:
-    buf = BytesIO()
-    plt.savefig(buf, format='PNG', dpi=100)
-    base64_str = base64.b64encode(buf.getvalue()).decode()
-    return 'base64://' + base64_str
+def pic2uri(pic: Image, **options) -> str:
+    """同`pic2b64`，但在OneBot端可访问本机文件时返回落盘后的路径或url，见`imgstore`"""
+    return imgstore.to_uri(imgcodec.encode(pic, imgcodec.default_options(**options)))
+
+
+def fig2uri(plt, dpi=None, **options) -> str:
+    options.setdefault('quantize', getattr(hoshino.config, 'FIGURE_QUANTIZE', False))
+    return imgstore.to_uri(imgcodec.encode_figure(plt, imgcodec.default_options(**options), dpi))
 
 
 def concat_pic(pics, border=5):
@@ -96,14 +106,82 @@ def concat_pic(pics, border=5):
     return des
 
 
+def _load_zh_hans_table():
+    """从zhconv的转换词典生成单字转换表
+
+    zhconv按最长匹配逐词转换，只有作为多字词条首字的字符才可能触发词组转换。
+    在遇到首个此类字符前，逐字查表与`zhconv.convert`结果完全一致。
+    """
+    try:
+        from zhconv.zhconv import getdict
+        zhdict = getdict('zh-hans')
+    except Exception as e:
+        hoshino.logger.exception(e)
+        return None, None
+    table = {ord(k): v for k, v in zhdict.items() if len(k) == 1}
+    heads = ''.join(sorted(set(k[0] for k in zhdict if len(k) > 1)))
+    return table, re.compile(f'[{re.escape(heads)}]') if heads else None
+
+_zh_hans_table, _re_zh_hans_phrase_head = _load_zh_hans_table()
+
+
+@lru_cache(maxsize=4096)
 def normalize_str(string) -> str:
     """
     规范化unicode字符串 并 转为小写 并 转为简体
     """
     string = unicodedata.normalize('NFKC', string)
     string = string.lower()
-    string = zhconv.convert(string, 'zh-hans')
-    return string
+    if _zh_hans_table is None:
+        return zhconv.convert(string, 'zh-hans')
+    m = _re_zh_hans_phrase_head and _re_zh_hans_phrase_head.search(string)
+    if not m:
+        return string.translate(_zh_hans_table)
+    pos = m.start()     # 自首个词条首字起交由zhconv做最长匹配
+    return string[:pos].translate(_zh_hans_table) + zhconv.convert(string[pos:], 'zh-hans')
+
+
+_normalize_preimages = None
+
+def normalize_preimages():
+    """
+    `normalize_str`的逆映射 {c: 原文中可能经规范化产生字符c的字符集合}，只含会被改变的字符，
+    其余字符只能由自身产生；仅覆盖BMP，转换词典不可用时返回None。
+    首次调用时遍历BMP建立，约需数十毫秒。
+    """
+    global _normalize_preimages
+    if _normalize_preimages is not None or _zh_hans_table is None:
+        return _normalize_preimages
+    from zhconv.zhconv import getdict
+    lower_inv = defaultdict(set)    # NFKC与小写化的逆映射
+    bases = {}
+    for i in range(0x10000):
+        if 0xD800 <= i < 0xE000:
+            continue
+        x = chr(i)
+        for c in unicodedata.normalize('NFKC', x).lower():
+            if c != x:
+                lower_inv[c].add(x)
+        base = unicodedata.normalize('NFD', x)[0]
+        if base != x:   # NFKC会将基字符与其后的组合字符合成为x
+            bases[x] = base
+    lower_inv['ς'].add('Σ')   # 词尾的Σ小写化为ς
+    for x, base in bases.items():
+        lower_inv[x].update(lower_inv[base] | {base})
+    zh_inv = defaultdict(set)   # 繁简转换（含词组）的逆映射
+    for k, v in getdict('zh-hans').items():
+        for c in v:
+            if c not in k:
+                zh_inv[c].update(k)
+    preimages = {}
+    for c in set(lower_inv) | set(zh_inv):
+        chars = {c} | lower_inv.get(c, set())
+        for y in zh_inv.get(c, ()):
+            chars.add(y)
+            chars.update(lower_inv.get(y, ()))
+        preimages[c] = frozenset(chars)
+    _normalize_preimages = preimages
+    return preimages
 
 
 MONTH_NAME = ('睦月', '如月', '弥生', '卯月', '皐月', '水無月',
@@ -177,19 +255,37 @@ class DailyNumberLimiter:
         self.count[key] = 0
 
 
-from .textfilter.filter import DFAFilter
+from .render import render_async, run_in_pool
+from .textfilter.acfilter import ACFilter
+
+_gfw = None
+
+def get_gfw() -> ACFilter:
+    """敏感词过滤器，首次使用时才加载词表"""
+    global _gfw
+    if _gfw is None:
+        gfw = ACFilter()
+        gfw.parse(os.path.join(os.path.dirname(__file__), 'textfilter/sensitive_words.txt'))
+        _gfw = gfw
+    return _gfw
+
 
-gfw = DFAFilter()
-gfw.parse(os.path.join(os.path.dirname(__file__), 'textfilter/sensitive_words.txt'))
+def __getattr__(name):
+    # 兼容原先的模块属性`util.gfw`（`from hoshino.util import gfw`），仍在首次访问时才加载词表
+    if name == 'gfw':
+        return get_gfw()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 def filt_message(message: Union[Message, str]):
+    gfw = get_gfw()
     if isinstance(message, str):
         return gfw.filter(message)
     elif isinstance(message, Message):
-        for seg in message:
-            if seg.type == 'text':
-                seg.data['text'] = gfw.filter(seg.data.get('text', ''))
+        segs = [seg for seg in message if seg.type == 'text']
+        texts = gfw.filter_many([seg.data.get('text', '') for seg in segs])
+        for seg, text in zip(segs, texts):
+            seg.data['text'] = text
         return message
     else:
         raise TypeError
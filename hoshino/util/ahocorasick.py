@@ -0,0 +1,156 @@
+"""Aho-Corasick 多模式匹配自动机
+
+一次扫描即可找出文本中出现的全部模式串，耗时与文本长度（及命中数）成正比，
+与模式串数量无关。
+
+>>> ac = Automaton()
+>>> ac.add('he', 1)
+>>> ac.add('she', 2)
+>>> sorted(ac.values('ushers'))
+[1, 2]
+"""
+
+import marshal
+from collections import deque
+from typing import Any, Dict, Iterator, List, Set, Tuple
+
+
+class Automaton:
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._own: List[Tuple[int, Any]] = [None]     # 恰好终止于该状态的模式 (length, value)
+        self._out: List[Tuple[Tuple[int, Any], ...]] = [()]  # 该状态可输出的全部模式（含失配链上的）
+        self._count = 0
+        self._dirty = False
+
+    def __len__(self):
+        return self._count
+
+    def __bool__(self):
+        return self._count > 0
+
+    def __contains__(self, pattern: str):
+        state = self._walk(pattern)
+        return state is not None and self._own[state] is not None
+
+    def _walk(self, pattern: str):
+        state = 0
+        for c in pattern:
+            state = self._goto[state].get(c)
+            if state is None:
+                return None
+        return state
+
+    def add(self, pattern: str, value: Any = None):
+        """添加模式串，重复添加时覆盖其value
+
+        添加只在字典树上延伸新节点并将自动机标记为待重建；
+        下一次扫描前会对整棵字典树重新计算全部失配链（而非只处理新增的子树），
+        因此连续添加多个模式（如启动时注册全部触发器）只会在首次扫描时重建一次。
+        """
+        if value is None:
+            value = pattern
+        state = 0
+        for c in pattern:
+            nxt = self._goto[state].get(c)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][c] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._own.append(None)
+                self._out.append(())
+            state = nxt
+        if self._own[state] is None:
+            self._count += 1
+        self._own[state] = (len(pattern), value)
+        self._dirty = True
+
+    def _build(self):
+        goto, fail, own, out = self._goto, self._fail, self._own, self._out
+        out[0] = ()     # 空模式只在扫描开始时报告一次，不沿失配链传播
+        queue = deque()
+        for s in goto[0].values():
+            fail[s] = 0
+            out[s] = (own[s], ) if own[s] else ()
+            queue.append(s)
+        while queue:
+            r = queue.popleft()
+            for c, s in goto[r].items():
+                queue.append(s)
+                f = fail[r]
+                while f and c not in goto[f]:
+                    f = fail[f]
+                f = goto[f].get(c, 0)
+                fail[s] = f
+                out[s] = ((own[s], ) if own[s] else ()) + out[f]
+        self._dirty = False
+
+    def iter(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """按出现位置依次产出 (end, length, value)，其中 text[end-length:end] 为命中的模式串"""
+        if self._dirty:
+            self._build()
+        if self._own[0] is not None:
+            yield 0, 0, self._own[0][1]
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, c in enumerate(text, 1):
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            for length, value in out[state]:
+                yield i, length, value
+
+    def values(self, text: str) -> Set[Any]:
+        """返回text中出现过的全部模式对应的value"""
+        if self._dirty:
+            self._build()
+        found = set()
+        if self._own[0] is not None:
+            found.add(self._own[0][1])
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for c in text:
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            for _, value in out[state]:
+                found.add(value)
+        return found
+
+    def shortest_matches(self, text: str) -> List[Tuple[int, int]]:
+        """自左向右取互不重叠的匹配，每个起点取最短的模式，返回 [(start, length)]"""
+        if self._dirty:
+            self._build()
+        goto, fail, out = self._goto, self._fail, self._out
+        shortest = {}
+        state = 0
+        for i, c in enumerate(text, 1):
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            for length, _ in out[state]:
+                start = i - length
+                if length < shortest.get(start, i + 1):
+                    shortest[start] = length
+        ret = []
+        pos = 0
+        for start in sorted(shortest):
+            if start >= pos and shortest[start]:
+                ret.append((start, shortest[start]))
+                pos = start + shortest[start]
+        return ret
+
+    def dumps(self) -> bytes:
+        """序列化编译好的自动机，value须为marshal支持的类型"""
+        if self._dirty:
+            self._build()
+        return marshal.dumps((self._goto, self._fail, self._own, self._out, self._count))
+
+    @classmethod
+    def loads(cls, data: bytes) -> "Automaton":
+        ac = cls()
+        ac._goto, ac._fail, ac._own, ac._out, ac._count = marshal.loads(data)
+        return ac
@@ -0,0 +1,141 @@
+"""发送图片的编码
+
+`pic2b64`、`fig2b64`与`render_async`共用的编码器，默认参数来自配置：
+- `IMAGE_FORMAT`：'PNG'、'JPEG'或'WEBP'
+- `IMAGE_QUALITY`：JPEG与WEBP的质量
+- `IMAGE_PNG_COMPRESS_LEVEL`：PNG的zlib压缩等级，PIL默认为6；1的体积稍大而编码快数倍
+- `FIGURE_DPI`、`FIGURE_QUANTIZE`：图表的分辨率，以及是否量化为256色调色板。
+  图表颜色很少，量化后的PNG通常只有原来的三分之一左右
+
+编码结果按 (像素内容的哈希, 编码参数) 缓存，总大小不超过`IMAGE_CACHE_BYTES`，
+重复发送相同的图片时无需再次编码。
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import NamedTuple, Tuple
+
+from PIL import Image
+
+import hoshino
+
+_FASTOCTREE = 2     # Image.FASTOCTREE，支持RGBA且远快于默认的MEDIANCUT
+
+
+class EncodeOptions(NamedTuple):
+    format: str = 'PNG'
+    quality: int = 85
+    compress_level: int = 6
+    quantize: bool = False
+
+
+def default_options(**overrides) -> EncodeOptions:
+    """读取配置中的编码参数，`overrides`中值为None的项不覆盖"""
+    config = hoshino.config
+    opts = EncodeOptions(
+        format=getattr(config, 'IMAGE_FORMAT', 'PNG').upper(),
+        quality=getattr(config, 'IMAGE_QUALITY', 85),
+        compress_level=getattr(config, 'IMAGE_PNG_COMPRESS_LEVEL', 6),
+    )
+    return opts._replace(**{k: v for k, v in overrides.items() if v is not None})
+
+
+class _EncodedCache:
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Tuple, bytes]" = OrderedDict()
+        self._lock = threading.Lock()   # render_async在线程池中编码
+
+    def get(self, key):
+        with self._lock:
+            data = self._data.get(key)
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._data.move_to_end(key)
+            return data
+
+    def put(self, key, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                return
+            self._data[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, old = self._data.popitem(last=False)
+                self.size -= len(old)
+
+
+cache = _EncodedCache(getattr(hoshino.config, 'IMAGE_CACHE_BYTES', 32 * 1024 * 1024))
+
+
+def _content_key(img: Image.Image) -> Tuple:
+    h = hashlib.blake2b(img.tobytes(), digest_size=16)
+    if img.mode in ('P', 'PA'):     # 像素数据只是调色板下标
+        h.update(bytes(img.getpalette() or ()))
+        h.update(repr(img.info.get('transparency')).encode())
+    return img.mode, img.size, h.digest()
+
+
+def _encode(img: Image.Image, opts: EncodeOptions) -> bytes:
+    buf = BytesIO()
+    if opts.format == 'JPEG':
+        if img.mode != 'RGB':
+            img = img.convert('RGBA')
+            bg = Image.new('RGB', img.size, (255, 255, 255))
+            bg.paste(img, mask=img.split()[3])
+            img = bg
+        img.save(buf, format='JPEG', quality=opts.quality)
+    elif opts.format == 'WEBP':
+        img.save(buf, format='WEBP', quality=opts.quality, method=0)
+    else:
+        if opts.quantize and img.mode not in ('P', 'L', '1'):
+            img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB').quantize(256, method=_FASTOCTREE)
+        img.save(buf, format=opts.format, compress_level=opts.compress_level)
+    return buf.getvalue()
+
+
+def encode(img: Image.Image, opts: EncodeOptions = None) -> bytes:
+    """将PIL图片编码为图片文件的字节，结果按内容缓存"""
+    opts = opts or default_options()
+    key = (_content_key(img), opts)
+    data = cache.get(key)
+    if data is None:
+        data = _encode(img, opts)
+        cache.put(key, data)
+    return data
+
+
+def figure_to_image(fig, dpi: int = None) -> Image.Image:
+    """将matplotlib的Figure（或pyplot模块，取当前Figure）光栅化为PIL图片"""
+    if hasattr(fig, 'gcf'):
+        fig = fig.gcf()
+    dpi = dpi or getattr(hoshino.config, 'FIGURE_DPI', 100)
+    canvas = fig.canvas
+    if hasattr(canvas, 'print_to_buffer'):     # Agg画布可直接取出像素
+        old_dpi = fig.dpi
+        fig.set_dpi(dpi)
+        try:
+            data, size = canvas.print_to_buffer()
+        finally:
+            fig.set_dpi(old_dpi)
+        return Image.frombuffer('RGBA', size, data, 'raw', 'RGBA', 0, 1)
+    buf = BytesIO()
+    fig.savefig(buf, format='png', dpi=dpi)
+    buf.seek(0)
+    return Image.open(buf)
+
+
+def encode_figure(fig, opts: EncodeOptions = None, dpi: int = None) -> bytes:
+    if opts is None:
+        opts = default_options(quantize=getattr(hoshino.config, 'FIGURE_QUANTIZE', False))
+    return encode(figure_to_image(fig, dpi), opts)
@@ -0,0 +1,91 @@
+"""渲染结果的落盘缓存
+
+资源协议（见`R.protocol`）为file或http时，渲染出的图片写入`RES_DIR/rendered/`，消息中只携带路径或url，
+避免base64使websocket帧膨胀三分之一。文件以内容哈希命名，相同的图片只保存一份；
+目录总大小超过`RENDERED_CACHE_BYTES`时按最近使用时间淘汰。
+协议为base64时（OneBot端无法访问本机文件）仍内联发送。
+"""
+
+import base64
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import hoshino
+
+SUBDIR = 'rendered'
+_EXTS = ((b'\x89PNG', '.png'), (b'\xff\xd8', '.jpg'), (b'RIFF', '.webp'), (b'GIF8', '.gif'))
+
+
+def _guess_ext(data: bytes) -> str:
+    for magic, ext in _EXTS:
+        if data.startswith(magic):
+            return ext
+    return '.png'
+
+
+class RenderedImageStore:
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._index: "OrderedDict[str, int]" = None    # {文件名: 大小}，按最近使用排序
+        self._lock = threading.Lock()   # 由渲染线程池调用
+
+    def _ensure_loaded(self):
+        if self._index is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                st = entry.stat()
+                files.append((st.st_mtime, entry.name, st.st_size))
+        files.sort()
+        self._index = OrderedDict((name, size) for _, name, size in files)
+        self.size = sum(self._index.values())
+
+    def save(self, data: bytes) -> str:
+        """保存图片并返回文件名"""
+        name = hashlib.blake2b(data, digest_size=16).hexdigest() + _guess_ext(data)
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            self._ensure_loaded()
+            if name in self._index:
+                self._index.move_to_end(name)
+                try:
+                    os.utime(path)
+                    return name
+                except FileNotFoundError:   # 被外部删除，重新写入
+                    self.size -= self._index.pop(name)
+            tmp_file = f'{path}.{threading.get_ident()}.tmp'
+            with open(tmp_file, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_file, path)
+            self._index[name] = len(data)
+            self.size += len(data)
+            self._evict()
+        return name
+
+    def _evict(self):
+        while self.size > self.max_bytes and len(self._index) > 1:
+            name, size = self._index.popitem(last=False)
+            self.size -= size
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+
+store = RenderedImageStore(os.path.join(os.path.expanduser(hoshino.config.RES_DIR), SUBDIR),
+                           getattr(hoshino.config, 'RENDERED_CACHE_BYTES', 256 * 1024 * 1024))
+
+
+def to_uri(data: bytes) -> str:
+    """返回可放入图片消息段的file://路径、url或base64"""
+    from hoshino import R
+    if R.protocol() not in ('file', 'http'):
+        return 'base64://' + base64.b64encode(data).decode()
+    return R.get(SUBDIR, store.save(data)).uri
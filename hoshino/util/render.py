@@ -0,0 +1,116 @@
+"""在线程池或进程池中执行图片渲染
+
+渲染与编码均在池中完成，事件循环只负责等待结果，不会因绘图阻塞其他群的消息处理。
+
+    seg = await util.render_async(chara.gen_team_pic, team)
+    await bot.send(ev, seg)
+
+- `executor='thread'`（默认）：适用于大部分PIL绘图，PIL的缩放与编码会释放GIL
+- `executor='process'`：适用于纯Python计算密集的渲染，`func`须可被pickle（模块级函数），
+  参数中的PIL图片会以原始字节传递
+
+注意：matplotlib.pyplot的全局状态不是线程安全的，绘制图表的函数应在函数内
+自行创建`Figure`对象，而非使用`plt`的全局接口。
+"""
+
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+from nonebot import MessageSegment
+from PIL import Image
+
+import hoshino
+
+from . import imgcodec, imgstore
+
+_cpu_count = os.cpu_count() or 1
+_pools = {}
+
+
+def _get_pool(executor: str) -> Executor:
+    if executor not in _pools:
+        if executor == 'thread':
+            workers = getattr(hoshino.config, 'RENDER_THREADS', None) or min(8, _cpu_count + 2)
+            _pools[executor] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hoshino-render')
+        elif executor == 'process':
+            workers = getattr(hoshino.config, 'RENDER_PROCESSES', None) or max(1, min(4, _cpu_count - 1))
+            _pools[executor] = ProcessPoolExecutor(max_workers=workers)
+        else:
+            raise ValueError(f'Unknown render executor `{executor}`, expecting `thread` or `process`')
+    return _pools[executor]
+
+
+class _PackedImage:
+    """以原始字节跨进程传递的PIL图片"""
+
+    def __init__(self, img: Image.Image):
+        self.mode = img.mode
+        self.size = img.size
+        self.data = img.tobytes()
+
+    def unpack(self) -> Image.Image:
+        return Image.frombytes(self.mode, self.size, self.data)
+
+
+def _pack(x):
+    if isinstance(x, Image.Image):
+        return _PackedImage(x)
+    if isinstance(x, (list, tuple)):
+        return type(x)(map(_pack, x))
+    return x
+
+
+def _unpack(x):
+    if isinstance(x, _PackedImage):
+        return x.unpack()
+    if isinstance(x, (list, tuple)):
+        return type(x)(map(_unpack, x))
+    return x
+
+
+def encode_image(obj, format=None) -> bytes:
+    """将PIL图片或matplotlib的Figure编码为图片文件的字节，编码参数见`imgcodec`"""
+    if isinstance(obj, (bytes, bytearray)):
+        return bytes(obj)
+    if isinstance(obj, Image.Image):
+        return imgcodec.encode(obj, imgcodec.default_options(format=format))
+    elif hasattr(obj, 'savefig'):
+        opts = imgcodec.default_options(format=format, quantize=getattr(hoshino.config, 'FIGURE_QUANTIZE', False))
+        return imgcodec.encode_figure(obj, opts)
+    else:
+        raise TypeError(f'Cannot encode `{type(obj)}` as image')
+
+
+def _render_job(func, args, kwargs, format) -> bytes:
+    args, kwargs = _unpack(args), {k: _unpack(v) for k, v in kwargs.items()}
+    return encode_image(func(*args, **kwargs), format)
+
+
+def _unpacked_call(func, *args, **kwargs):
+    return _pack(func(*_unpack(args), **{k: _unpack(v) for k, v in kwargs.items()}))
+
+
+async def run_in_pool(func: Callable, *args, executor='thread', **kwargs) -> Any:
+    """在渲染池中执行`func(*args, **kwargs)`并返回其结果"""
+    loop = asyncio.get_event_loop()
+    pool = _get_pool(executor)
+    if executor == 'process':
+        args, kwargs = _pack(args), {k: _pack(v) for k, v in kwargs.items()}
+        return _unpack(await loop.run_in_executor(pool, partial(_unpacked_call, func, *args, **kwargs)))
+    return await loop.run_in_executor(pool, partial(func, *args, **kwargs))
+
+
+async def render_async(func: Callable, *args, executor='thread', format=None, **kwargs) -> MessageSegment:
+    """在渲染池中执行返回PIL图片或Figure的`func`，编码后返回可直接发送的图片消息段
+
+    OneBot端可访问本机文件时，图片落盘后以路径或url发送，见`imgstore`
+    """
+    if executor == 'process':
+        args, kwargs = _pack(args), {k: _pack(v) for k, v in kwargs.items()}
+    loop = asyncio.get_event_loop()
+    data = await loop.run_in_executor(_get_pool(executor), partial(_render_job, func, args, kwargs, format))
+    uri = await loop.run_in_executor(_get_pool('thread'), imgstore.to_uri, data)
+    return MessageSegment.image(uri)
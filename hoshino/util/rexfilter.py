@@ -0,0 +1,113 @@
+"""正则表达式的字面量预筛选
+
+从正则中提取"匹配成功时文本必然包含"的字面量条件，
+用于在执行完整的`rex.search`前快速排除不可能匹配的消息。
+
+条件以`List[FrozenSet[str]]`表示：列表中每一项都必须满足，
+一项满足即文本包含该集合中的任意一个字符串。空列表表示无法预筛选。
+
+>>> req = required_literals(re.compile(r'(来|來)(.*(份|个)(.*)(睡|茶)(.*))套餐'))
+>>> may_match(req, '来一份睡眠套餐'), may_match(req, '来一份')
+(True, False)
+"""
+
+import re
+from typing import Dict, FrozenSet, List
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+Required = List[FrozenSet[str]]
+
+_MAX_CHARSET = 32   # 字符集超过该大小时筛选效果差，不再展开
+
+_REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}
+if hasattr(sre_parse, 'POSSESSIVE_REPEAT'):
+    _REPEATS.add(sre_parse.POSSESSIVE_REPEAT)
+_ATOMIC_GROUP = getattr(sre_parse, 'ATOMIC_GROUP', None)
+
+
+def _charset(items):
+    chars = set()
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            chars.add(chr(av))
+        elif op is sre_parse.RANGE and av[1] - av[0] < _MAX_CHARSET:
+            chars.update(map(chr, range(av[0], av[1] + 1)))
+        else:
+            return None     # NEGATE, CATEGORY 或过大的区间
+    return frozenset(chars) if len(chars) <= _MAX_CHARSET else None
+
+
+def _best(required: Required) -> FrozenSet[str]:
+    return max(required, key=lambda c: (min(map(len, c)), -len(c)))
+
+
+def _required(parsed) -> Required:
+    ret = []
+    run = []
+
+    def flush():
+        if run:
+            ret.append(frozenset((''.join(run), )))
+            run.clear()
+
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+        flush()
+        if op is sre_parse.IN:
+            chars = _charset(av)
+            if chars:
+                ret.append(chars)
+        elif op is sre_parse.SUBPATTERN:
+            _, add_flags, _, p = av
+            if not add_flags & re.IGNORECASE:
+                ret.extend(_required(p))
+        elif op is _ATOMIC_GROUP:
+            ret.extend(_required(av))
+        elif op in _REPEATS:
+            min_, _, p = av
+            if min_ >= 1:
+                ret.extend(_required(p))
+        elif op is sre_parse.BRANCH:
+            alternatives = [_required(p) for p in av[1]]
+            if all(alternatives):
+                ret.append(frozenset().union(*map(_best, alternatives)))
+    flush()
+    return ret
+
+
+def required_literals(rex: re.Pattern) -> Required:
+    """提取正则`rex`匹配成功时的必需字面量，无法分析时返回空列表"""
+    if not isinstance(rex.pattern, str) or rex.flags & re.IGNORECASE:
+        return []
+    try:
+        return list(dict.fromkeys(_required(sre_parse.parse(rex.pattern, rex.flags))))
+    except Exception:
+        return []
+
+
+def relax(required: Required, preimages: Dict[str, FrozenSet[str]]) -> Required:
+    """将对规范化文本的条件放宽为对原文的条件
+
+    `preimages`见`util.normalize_preimages`。每个字面量取其中可能来源最少的一个字符，
+    原文不含该字符的任何来源时，规范化后的文本必然不含该字面量。
+    """
+    def sources(c):
+        return preimages.get(c) or frozenset(c)
+    return [frozenset().union(*(min(map(sources, s), key=len) for s in clause)) for clause in required]
+
+
+def may_match(required: Required, text: str) -> bool:
+    """`text`不满足`required`时，对应的正则必然无法匹配"""
+    for clause in required:
+        for s in clause:
+            if s in text:
+                break
+        else:
+            return False
+    return True
@@ -0,0 +1,92 @@
+"""基于Aho-Corasick自动机的敏感词过滤
+
+输出与`DFAFilter`完全一致（每个位置取以其开头的最短敏感词，匹配互不重叠），
+但一次扫描完成，耗时与消息长度成线性关系。
+编译好的自动机按词表内容的哈希缓存于`~/.hoshino/cache/`，词表不变时启动无需重新构建。
+
+>>> f = ACFilter()
+>>> f.add("sexy")
+>>> f.filter("hello sexy baby")
+'hello **** baby'
+"""
+
+import hashlib
+import io
+import os
+from typing import List
+
+import hoshino
+from hoshino.util.ahocorasick import Automaton
+
+_CACHE_VERSION = 1
+_SEP = '\x00'    # 分隔多段文本，与DFAFilter一样不支持含该字符的敏感词
+_cache_dir = os.path.expanduser('~/.hoshino/cache/')
+
+
+class ACFilter:
+
+    def __init__(self):
+        self._ac = Automaton()
+
+    def add(self, keyword):
+        chars = keyword.strip()
+        if chars and _SEP not in chars:
+            self._ac.add(chars, len(chars))
+
+    def parse(self, path):
+        """读取词表，优先使用缓存的自动机"""
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha1(data).hexdigest()
+        cache_file = os.path.join(_cache_dir, f'textfilter-v{_CACHE_VERSION}-{digest}.marshal')
+        try:
+            with open(cache_file, 'rb') as f:
+                self._ac = Automaton.loads(f.read())
+            return
+        except (OSError, ValueError, EOFError, TypeError):
+            pass
+        for keyword in io.StringIO(data.decode('utf8'), newline=None):
+            self.add(keyword.strip())
+        tmp_file = f'{cache_file}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(_cache_dir, exist_ok=True)
+            with open(tmp_file, 'wb') as f:
+                f.write(self._ac.dumps())
+            os.replace(tmp_file, cache_file)
+        except OSError as e:    # 缓存目录不可写时仍使用内存中的自动机
+            hoshino.logger.warning(f'无法写入敏感词自动机缓存 {cache_file}: {e}')
+
+    def filter(self, message, repl="*"):
+        matches = self._ac.shortest_matches(message)
+        if not matches:
+            return message
+        ret = []
+        pos = 0
+        for start, length in matches:
+            ret.append(message[pos:start])
+            ret.append(repl * length)
+            pos = start + length
+        ret.append(message[pos:])
+        return ''.join(ret)
+
+    def filter_many(self, messages: List[str], repl="*") -> List[str]:
+        """一次扫描过滤多段文本，匹配不会跨越文本边界"""
+        text = _SEP.join(messages)
+        matches = self._ac.shortest_matches(text)
+        ret = []
+        i = 0
+        seg_start = 0
+        for m in messages:
+            seg_end = seg_start + len(m)
+            parts = []
+            pos = seg_start
+            while i < len(matches) and matches[i][0] < seg_end:
+                start, length = matches[i]
+                parts.append(text[pos:start])
+                parts.append(repl * length)
+                pos = start + length
+                i += 1
+            parts.append(text[pos:seg_end])
+            ret.append(''.join(parts))
+            seg_start = seg_end + len(_SEP)
+        return ret